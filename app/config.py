@@ -4,63 +4,194 @@ Handles environment variables and application settings.
 """
 
 import os
-from dataclasses import dataclass
-from typing import Optional
+import tempfile
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Tuple
 
 
-@dataclass
+def _parse_bool(value: str) -> bool:
+    """Parse a 'true'/'false' environment value, case-insensitively."""
+    return value.lower() == 'true'
+
+
+def _from_env(variables: Dict[str, Tuple[str, Callable[[str], Any]]]) -> Dict[str, Any]:
+    """Parse the environment into constructor arguments.
+    
+    ``variables`` maps each field to its (environment variable, parser). Only
+    variables that are set are returned, so unset ones keep the field default.
+    """
+    return {
+        field_name: parse(os.environ[name])
+        for field_name, (name, parse) in variables.items()
+        if name in os.environ
+    }
+
+
+@dataclass(frozen=True, slots=True)
 class DatabaseConfig:
     """Database configuration settings."""
-    host: str = os.getenv('DB_HOST', 'localhost')
-    port: int = int(os.getenv('DB_PORT', '5432'))
-    name: str = os.getenv('DB_NAME', 'healthcare_db')
-    user: str = os.getenv('DB_USER', 'db_user')
-    password: str = os.getenv('DB_PASSWORD', 'db_pass')
+    host: str = 'localhost'
+    port: int = 5432
+    name: str = 'healthcare_db'
+    user: str = 'db_user'
+    password: str = 'db_pass'
+    # Connections per process; threads beyond this wait for one to be returned
+    pool_size: int = 20
+    # Connections opened up front when the pool is created
+    pool_min_size: int = 5
+    # Seconds a thread waits for a free connection before giving up
+    pool_timeout: float = 30.0
+    
+    # Batches at or above this size are loaded with COPY instead of INSERT;
+    # the default matches BATCH_SIZE so full processing chunks use COPY
+    copy_threshold: int = 50
+    
+    # Processing log entries are buffered and written in batches
+    log_flush_interval: float = 0.2
+    log_flush_size: int = 500
+    
+    # Session memory for rebuilding indexes after a bulk load
+    bulk_load_maintenance_work_mem: str = '1GB'
+    # Seconds a bulk load waits for another load's index DDL before running without bulk load mode
+    bulk_lock_timeout: float = 60.0
+    
+    # PostgreSQL connection string, built once in __post_init__
+    connection_string: str = field(init=False, repr=False, compare=False)
     
-    @property
-    def connection_string(self) -> str:
-        """Generate PostgreSQL connection string."""
-        return f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
+    def __post_init__(self):
+        object.__setattr__(
+            self,
+            'connection_string',
+            f"postgresql://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
+        )
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AzureConfig:
     """Azure services configuration."""
-    form_recognizer_endpoint: str = os.getenv(
-        'AZURE_FORM_RECOGNIZER_ENDPOINT', 
-        'https://<your-form-recognizer-endpoint>.cognitiveservices.azure.com/'
-    )
-    form_recognizer_key: str = os.getenv('AZURE_FORM_RECOGNIZER_KEY', '<your-form-recognizer-key>')
-    blob_connection_string: str = os.getenv('AZURE_BLOB_CONNECTION_STRING', '<your-blob-connection-string>')
+    form_recognizer_endpoint: str = 'https://<your-form-recognizer-endpoint>.cognitiveservices.azure.com/'
+    form_recognizer_key: str = '<your-form-recognizer-key>'
+    blob_connection_string: str = '<your-blob-connection-string>'
+    # Concurrent Form Recognizer requests during batch processing
+    max_workers: int = 8
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class NLPConfig:
     """NLP processing configuration."""
-    model_name: str = os.getenv('SPACY_MODEL', 'en_core_web_sm')
-    confidence_threshold: float = float(os.getenv('CONFIDENCE_THRESHOLD', '0.75'))
+    model_name: str = 'en_core_web_sm'
+    confidence_threshold: float = 0.75
+    # Number of texts spaCy processes per minibatch in nlp.pipe()
+    pipe_batch_size: int = 64
+    # Number of extraction results kept per NLPService, keyed by text hash
+    cache_size: int = 1024
+    # Find PERSON/DATE with rule patterns instead of running the statistical NER model
+    use_rule_based_ner: bool = False
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AppConfig:
     """Main application configuration."""
-    debug: bool = os.getenv('DEBUG', 'False').lower() == 'true'
-    secret_key: str = os.getenv('SECRET_KEY', 'your-secret-key-here')
-    log_level: str = os.getenv('LOG_LEVEL', 'INFO')
-    log_file: str = os.getenv('LOG_FILE', 'processing.log')
+    debug: bool = False
+    secret_key: str = 'your-secret-key-here'
+    log_level: str = 'INFO'
+    log_file: str = 'processing.log'
     
     # File processing settings
-    supported_formats: tuple = ('.jpg', '.jpeg', '.png', '.tiff', '.pdf')
-    batch_size: int = int(os.getenv('BATCH_SIZE', '10'))
+    # Lowercase extensions; a frozenset makes membership checks O(1)
+    supported_formats: frozenset = frozenset(('.jpg', '.jpeg', '.png', '.tiff', '.pdf'))
+    # Files per chunk in batch processing; bounds in-flight Azure analyses and memory per chunk
+    batch_size: int = 50
+    # process_batch imports with at least this many files run with secondary indexes dropped
+    bulk_load_min_files: int = 1000
     
     # Web interface settings
-    host: str = os.getenv('HOST', '0.0.0.0')
-    port: int = int(os.getenv('PORT', '8000'))
+    host: str = '0.0.0.0'
+    port: int = 8000
+    # Uvicorn worker processes; each opens its own DB pool of up to DB_POOL_SIZE connections
+    workers: int = 1
+    # Threads running OCR/NLP processing for web requests, separate from Starlette's threadpool
+    processing_workers: int = 4
+    # Seconds dashboard/review query results are reused before hitting the database again
+    view_cache_ttl: float = 15.0
+    # Compiled Jinja templates are cached here so workers skip parsing them
+    template_cache_dir: str = os.path.join(tempfile.gettempdir(), 'meddocreader_jinja')
+    # Seconds browsers may reuse /static assets before revalidating them
+    static_max_age: int = 86400
+    # Directory uploaded files are stored in
+    upload_dir: str = 'uploads'
+    # Uploads larger than this are rejected
+    max_upload_mb: int = 50
 
 
-# Global configuration instance
-config = AppConfig()
-db_config = DatabaseConfig()
-azure_config = AzureConfig()
-nlp_config = NLPConfig()
+@lru_cache(maxsize=1)
+def get_config() -> AppConfig:
+    """Return the application configuration, parsed from the environment once per process."""
+    return AppConfig(**_from_env({
+        'debug': ('DEBUG', _parse_bool),
+        'secret_key': ('SECRET_KEY', str),
+        'log_level': ('LOG_LEVEL', str),
+        'log_file': ('LOG_FILE', str),
+        'batch_size': ('BATCH_SIZE', int),
+        'bulk_load_min_files': ('BULK_LOAD_MIN_FILES', int),
+        'host': ('HOST', str),
+        'port': ('PORT', int),
+        'workers': ('WEB_CONCURRENCY', int),
+        'processing_workers': ('PROCESSING_WORKERS', int),
+        'view_cache_ttl': ('VIEW_CACHE_TTL', float),
+        'template_cache_dir': ('TEMPLATE_CACHE_DIR', str),
+        'static_max_age': ('STATIC_MAX_AGE', int),
+        'upload_dir': ('UPLOAD_DIR', str),
+        'max_upload_mb': ('MAX_UPLOAD_MB', int),
+    }))
+
+
+@lru_cache(maxsize=1)
+def get_db_config() -> DatabaseConfig:
+    """Return the database configuration, parsed from the environment once per process."""
+    return DatabaseConfig(**_from_env({
+        'host': ('DB_HOST', str),
+        'port': ('DB_PORT', int),
+        'name': ('DB_NAME', str),
+        'user': ('DB_USER', str),
+        'password': ('DB_PASSWORD', str),
+        'pool_size': ('DB_POOL_SIZE', int),
+        'pool_min_size': ('DB_POOL_MIN_SIZE', int),
+        'pool_timeout': ('DB_POOL_TIMEOUT', float),
+        'copy_threshold': ('DB_COPY_THRESHOLD', int),
+        'log_flush_interval': ('DB_LOG_FLUSH_INTERVAL', float),
+        'log_flush_size': ('DB_LOG_FLUSH_SIZE', int),
+        'bulk_load_maintenance_work_mem': ('DB_BULK_MAINTENANCE_WORK_MEM', str),
+        'bulk_lock_timeout': ('DB_BULK_LOCK_TIMEOUT', float),
+    }))
+
+
+@lru_cache(maxsize=1)
+def get_azure_config() -> AzureConfig:
+    """Return the Azure configuration, parsed from the environment once per process."""
+    return AzureConfig(**_from_env({
+        'form_recognizer_endpoint': ('AZURE_FORM_RECOGNIZER_ENDPOINT', str),
+        'form_recognizer_key': ('AZURE_FORM_RECOGNIZER_KEY', str),
+        'blob_connection_string': ('AZURE_BLOB_CONNECTION_STRING', str),
+        'max_workers': ('AZURE_MAX_WORKERS', int),
+    }))
 
+
+@lru_cache(maxsize=1)
+def get_nlp_config() -> NLPConfig:
+    """Return the NLP configuration, parsed from the environment once per process."""
+    return NLPConfig(**_from_env({
+        'model_name': ('SPACY_MODEL', str),
+        'confidence_threshold': ('CONFIDENCE_THRESHOLD', float),
+        'pipe_batch_size': ('SPACY_BATCH_SIZE', int),
+        'cache_size': ('NLP_CACHE_SIZE', int),
+        'use_rule_based_ner': ('NLP_RULE_BASED_NER', _parse_bool),
+    }))
+
+
+# Global configuration instance
+config = get_config()
+db_config = get_db_config()
+azure_config = get_azure_config()
+nlp_config = get_nlp_config()
@@ -3,71 +3,353 @@ Database connection and management for MedDocReader.
 Handles PostgreSQL connections and provides database utilities.
 """
 
+import io
+import threading
+import time
+import uuid
+import orjson
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
 import logging
 from contextlib import contextmanager
-from typing import Optional, Dict, Any, List
+from typing import Optional, Any, Iterator, List, Sequence, Tuple
 from app.config import db_config
 
 
 logger = logging.getLogger(__name__)
 
 
+def _dumps_json(value: Any) -> str:
+    """Serialize a value for a JSONB column using orjson."""
+    return orjson.dumps(value).decode()
+
+
+# Use orjson for JSONB in both directions; dicts are adapted to JSONB automatically
+psycopg2.extras.register_default_jsonb(globally=True, loads=orjson.loads)
+psycopg2.extensions.register_adapter(dict, lambda value: psycopg2.extras.Json(value, dumps=_dumps_json))
+
+# Unquoted field that copy_insert's COPY reads as NULL
+_COPY_NULL = '\\N'
+
+# Tables created by init_database
+SCHEMA_TABLES = ('documents', 'patients', 'processing_logs')
+
+# Secondary indexes by name; dropped and rebuilt around bulk loads
+SECONDARY_INDEXES = {
+    # Serves status filters and the per-status "most recent first" listings as one range scan
+    'idx_documents_status_upload_date': "documents(processing_status, upload_date DESC)",
+    # Serves the documents API ETag's max(updated_at) and count(*) per status from the index alone
+    'idx_documents_status_updated_at': "documents(processing_status, updated_at)",
+    'idx_documents_upload_date': "documents(upload_date)",
+    'idx_documents_metadata_gin': "documents USING GIN (metadata jsonb_path_ops)",
+    'idx_patients_document_id': "patients(document_id)",
+    'idx_patients_low_conf': (
+        "patients(document_id) "
+        "WHERE name_confidence < 0.75 OR dob_confidence < 0.75 OR insurance_confidence < 0.75"
+    ),
+    'idx_documents_needs_review': "documents(upload_date DESC) WHERE processing_status = 'needs_review'",
+}
+
+# Indexes from earlier schema versions, dropped by init_database in favor of SECONDARY_INDEXES
+SUPERSEDED_INDEXES = ('idx_documents_status',)
+
+# Advisory lock keys coordinating bulk loads across threads and processes.
+# Every running load holds the active lock shared; index DDL runs under the DDL lock.
+BULK_LOAD_ACTIVE_LOCK = 'meddocreader_bulk_load'
+BULK_LOAD_DDL_LOCK = 'meddocreader_bulk_load_ddl'
+
+
+class PreparedStatementConnection(psycopg2.extensions.connection):
+    """Connection that tracks which named statements its session has prepared."""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
 class DatabaseManager:
-    """Manages database connections and operations."""
+    """Manages pooled database connections and operations."""
     
     def __init__(self):
         self.connection_string = db_config.connection_string
-        self._connection: Optional[psycopg2.extensions.connection] = None
+        self._pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises PoolError when exhausted; callers wait on this instead
+        self._pool_slots = threading.BoundedSemaphore(db_config.pool_size)
+        # Per-thread flag set inside bulk_load_mode or by join_bulk_load
+        self._local = threading.local()
     
-    def connect(self) -> psycopg2.extensions.connection:
-        """Establish database connection."""
-        try:
-            if self._connection is None or self._connection.closed:
-                self._connection = psycopg2.connect(
-                    self.connection_string,
-                    cursor_factory=psycopg2.extras.RealDictCursor
-                )
-                logger.info("Database connection established successfully.")
-            return self._connection
-        except psycopg2.Error as e:
-            logger.error(f"Database connection error: {e}")
-            raise
+    def connect(self) -> psycopg2.pool.ThreadedConnectionPool:
+        """Create the connection pool on first use and return it."""
+        if self._pool is not None and not self._pool.closed:
+            return self._pool
+        
+        with self._pool_lock:
+            if self._pool is None or self._pool.closed:
+                try:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        min(db_config.pool_min_size, db_config.pool_size),
+                        db_config.pool_size,
+                        self.connection_string,
+                        connection_factory=PreparedStatementConnection
+                    )
+                    logger.info(f"Database connection pool established (max {db_config.pool_size} connections).")
+                except psycopg2.Error as e:
+                    logger.error(f"Database connection error: {e}")
+                    raise
+        return self._pool
+    
+    @property
+    def is_connected(self) -> bool:
+        """Whether the connection pool has been created and not closed since."""
+        return self._pool is not None and not self._pool.closed
     
     def disconnect(self):
-        """Close database connection."""
-        if self._connection and not self._connection.closed:
-            self._connection.close()
-            logger.info("Database connection closed.")
+        """Close all pooled database connections."""
+        if self.is_connected:
+            self._pool.closeall()
+            logger.info("Database connection pool closed.")
     
     @contextmanager
-    def get_cursor(self):
-        """Context manager for database cursor."""
-        conn = self.connect()
-        cursor = conn.cursor()
+    def _checkout(self) -> Iterator[psycopg2.extensions.connection]:
+        """Check a connection out of the pool, waiting up to db_config.pool_timeout for a free one."""
+        pool = self.connect()
+        if not self._pool_slots.acquire(timeout=db_config.pool_timeout):
+            raise psycopg2.pool.PoolError(
+                f"No database connection became free within {db_config.pool_timeout}s "
+                f"(all {db_config.pool_size} are in use)"
+            )
         try:
-            yield cursor
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"Database error: {e}")
-            raise
+            conn = pool.getconn()
+            try:
+                yield conn
+            finally:
+                # Discard connections that died mid-request instead of recycling them
+                pool.putconn(conn, close=bool(conn.closed))
         finally:
-            cursor.close()
+            self._pool_slots.release()
+    
+    @contextmanager
+    def get_cursor(self, cursor_factory=None, name: str = None):
+        """Context manager for a cursor on a connection checked out from the pool.
+        
+        Cursors return plain tuples; pass ``cursor_factory=RealDictCursor`` for
+        callers that need rows keyed by column name. Passing ``name`` creates a
+        server-side cursor that fetches rows from PostgreSQL in batches.
+        """
+        with self._checkout() as conn:
+            if self.bulk_loading:
+                with conn.cursor() as setup_cursor:
+                    setup_cursor.execute("SET LOCAL synchronous_commit = off")
+            cursor = conn.cursor(name=name, cursor_factory=cursor_factory)
+            try:
+                try:
+                    yield cursor
+                finally:
+                    # Commit and rollback destroy server-side cursors, so close it first
+                    cursor.close()
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Database error: {e}")
+                raise
     
-    def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+    @property
+    def bulk_loading(self) -> bool:
+        """Whether transactions on the current thread run in bulk load mode."""
+        return getattr(self._local, 'bulk_load', False)
+    
+    def join_bulk_load(self):
+        """Run the current thread's transactions with synchronous_commit off.
+        
+        Meant as the ``initializer`` of a short-lived ThreadPoolExecutor created
+        inside bulk_load_mode, so its workers write the same way as the caller.
+        """
+        self._local.bulk_load = True
+    
+    @contextmanager
+    def bulk_load_mode(self):
+        """Drop secondary indexes for the duration of a bulk ingest and rebuild them afterwards.
+        
+        While active, the calling thread's transactions run with synchronous_commit
+        off. Bulk loads may overlap, in this process or another: the indexes are
+        dropped when the first one starts and rebuilt when the last one finishes,
+        counted through a shared advisory lock that each load holds. Indexes are
+        dropped and recreated CONCURRENTLY on a dedicated autocommit connection
+        so concurrent readers are not blocked.
+        
+        Raises TimeoutError if another load's index DDL does not finish within
+        db_config.bulk_lock_timeout, so the caller can load without bulk load mode
+        rather than hold a pooled connection indefinitely.
+        """
+        with self._checkout() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cursor:
+                    _acquire_advisory_lock(cursor, BULK_LOAD_DDL_LOCK, timeout=db_config.bulk_lock_timeout)
+                    try:
+                        for index_name in SECONDARY_INDEXES:
+                            cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+                        cursor.execute("SELECT pg_advisory_lock_shared(hashtext(%s))", (BULK_LOAD_ACTIVE_LOCK,))
+                    finally:
+                        cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (BULK_LOAD_DDL_LOCK,))
+                logger.info("Secondary indexes dropped for bulk load.")
+                
+                was_bulk_loading = self.bulk_loading
+                self._local.bulk_load = True
+                try:
+                    yield
+                finally:
+                    self._local.bulk_load = was_bulk_loading
+                    self._finish_bulk_load(conn)
+            finally:
+                conn.autocommit = False
+    
+    def _finish_bulk_load(self, conn):
+        """Leave a bulk load and rebuild the secondary indexes if no other load is still running.
+        
+        Waits for the DDL lock without a deadline: the load's shared lock has to be
+        released before its connection goes back to the pool.
+        """
+        with conn.cursor() as cursor:
+            _acquire_advisory_lock(cursor, BULK_LOAD_DDL_LOCK)
+            try:
+                cursor.execute("SELECT pg_advisory_unlock_shared(hashtext(%s))", (BULK_LOAD_ACTIVE_LOCK,))
+                # The exclusive lock is only free once every other load has released its shared one
+                cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (BULK_LOAD_ACTIVE_LOCK,))
+                if not cursor.fetchone()[0]:
+                    logger.info("Another bulk load is still running; it will rebuild the secondary indexes.")
+                    return
+                try:
+                    cursor.execute("SET maintenance_work_mem = %s", (db_config.bulk_load_maintenance_work_mem,))
+                    for index_name, definition in SECONDARY_INDEXES.items():
+                        cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} ON {definition}")
+                    cursor.execute("RESET maintenance_work_mem")
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (BULK_LOAD_ACTIVE_LOCK,))
+                logger.info("Secondary indexes rebuilt after bulk load.")
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (BULK_LOAD_DDL_LOCK,))
+    
+    def execute_query(self, query: str, params: tuple = None, cursor_factory=None) -> List[tuple]:
         """Execute a SELECT query and return results."""
-        with self.get_cursor() as cursor:
+        with self.get_cursor(cursor_factory) as cursor:
             cursor.execute(query, params)
             return cursor.fetchall()
     
+    def execute_query_stream(self, query: str, params: tuple = None,
+                             batch_size: int = 2000) -> Iterator[tuple]:
+        """Execute a SELECT query and yield rows as they arrive from a server-side cursor.
+        
+        Only ``batch_size`` rows are held in memory at a time. The connection
+        stays checked out until the generator is exhausted or closed.
+        """
+        with self.get_cursor(name=f"stream_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+            yield from cursor
+    
     def execute_update(self, query: str, params: tuple = None) -> int:
         """Execute an INSERT/UPDATE/DELETE query and return affected rows."""
         with self.get_cursor() as cursor:
             cursor.execute(query, params)
             return cursor.rowcount
     
+    def execute_prepared_query(self, name: str, statement: str, params: tuple = ()) -> List[tuple]:
+        """Execute a named server-side prepared statement and return results."""
+        with self.get_cursor() as cursor:
+            self._execute_prepared(cursor, name, statement, params)
+            return cursor.fetchall()
+    
+    def execute_prepared_update(self, name: str, statement: str, params: tuple = ()) -> int:
+        """Execute a named server-side prepared statement and return affected rows."""
+        with self.get_cursor() as cursor:
+            self._execute_prepared(cursor, name, statement, params)
+            return cursor.rowcount
+    
+    def execute_prepared_transaction(self, statements: Sequence[Tuple[str, str, tuple]]) -> List[int]:
+        """Execute several (name, statement, params) prepared statements in one transaction.
+        
+        Everything is committed once at the end, or rolled back together if any
+        statement fails. Returns the affected row count of each statement.
+        """
+        rowcounts = []
+        with self.get_cursor() as cursor:
+            for name, statement, params in statements:
+                self._execute_prepared(cursor, name, statement, params)
+                rowcounts.append(cursor.rowcount)
+        return rowcounts
+    
+    def _execute_prepared(self, cursor, name: str, statement: str, params: tuple):
+        """Prepare the statement once per connection, then bind and execute it.
+        
+        The statement uses $1, $2, ... placeholders and is parsed and planned
+        by the server only on the first call for each pooled connection.
+        """
+        prepared = cursor.connection.prepared_statements
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {statement}")
+            prepared.add(name)
+        
+        if params:
+            placeholders = ", ".join(["%s"] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})", params)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+    
+    def insert_many(self, table: str, columns: Sequence[str], rows: List[tuple]) -> List[int]:
+        """Insert rows with multi-row VALUES statements and return the generated ids."""
+        if not rows:
+            return []
+        
+        # Stay under PostgreSQL's 65535 bind parameter limit per statement
+        page_size = min(1000, 65535 // len(columns))
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s RETURNING id"
+        with self.get_cursor() as cursor:
+            result = psycopg2.extras.execute_values(
+                cursor, query, rows, template=None, page_size=page_size, fetch=True
+            )
+            return [row[0] for row in result]
+    
+    def copy_insert(self, table: str, columns: Sequence[str], rows: List[tuple]) -> List[int]:
+        """Bulk insert rows with COPY and return the generated ids.
+        
+        Rows are streamed into a temporary staging table and then moved into
+        the target table with a single INSERT ... SELECT so the new ids can be
+        returned, which COPY alone cannot do. Each staged row carries its
+        position, and rows are inserted in that order so the ids come back in
+        the same order as ``rows``.
+        """
+        if not rows:
+            return []
+        
+        buffer = io.StringIO()
+        for ordinal, row in enumerate(rows):
+            buffer.write(f"{ordinal}\t")
+            buffer.write("\t".join(map(_to_copy_value, row)))
+            buffer.write("\n")
+        buffer.seek(0)
+        
+        column_list = ", ".join(columns)
+        staging_table = f"{table}_staging"
+        with self.get_cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS "
+                f"SELECT 0 AS ordinal, {column_list} FROM {table} WITH NO DATA"
+            )
+            cursor.copy_expert(
+                f"COPY {staging_table} (ordinal, {column_list}) FROM STDIN "
+                f"WITH (FORMAT csv, DELIMITER E'\\t', NULL '{_COPY_NULL}')",
+                buffer
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT {column_list} FROM {staging_table} ORDER BY ordinal RETURNING id"
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
     def health_check(self) -> bool:
         """Check if database is accessible."""
         try:
@@ -79,6 +361,42 @@ class DatabaseManager:
             return False
 
 
+def _acquire_advisory_lock(cursor, key: str, timeout: Optional[float] = None, poll_interval: float = 0.1):
+    """Take a session-level advisory lock, polling instead of blocking.
+    
+    A session blocked in pg_advisory_lock holds a snapshot, and the lock holder's
+    CREATE/DROP INDEX CONCURRENTLY waits for every older snapshot, so blocking
+    here would deadlock the two. Raises TimeoutError if the lock is still taken
+    after ``timeout`` seconds; with no timeout it waits indefinitely.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (key,))
+        if cursor.fetchone()[0]:
+            return
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"Advisory lock {key!r} not acquired within {timeout}s")
+        time.sleep(poll_interval)
+
+
+def _to_copy_value(value: Any) -> str:
+    """Convert a Python value to a field of copy_insert's CSV input.
+    
+    NULL is the unquoted _COPY_NULL marker and every other value is quoted, so
+    empty strings, and strings that happen to read \\N, are not loaded as NULL.
+    """
+    if value is None:
+        return _COPY_NULL
+    if isinstance(value, dict):
+        text = _dumps_json(value)
+    elif isinstance(value, (list, tuple)):
+        items = ('"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value)
+        text = "{" + ",".join(items) + "}"
+    else:
+        text = str(value)
+    return '"' + text.replace('"', '""') + '"'
+
+
 # Global database manager instance
 db_manager = DatabaseManager()
 
@@ -130,16 +448,65 @@ def init_database():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     );
     
-    CREATE INDEX IF NOT EXISTS idx_documents_status ON documents(processing_status);
-    CREATE INDEX IF NOT EXISTS idx_documents_upload_date ON documents(upload_date);
-    CREATE INDEX IF NOT EXISTS idx_patients_document_id ON patients(document_id);
     """
+    create_indexes_sql = "".join(
+        f"DROP INDEX IF EXISTS {index_name};\n" for index_name in SUPERSEDED_INDEXES
+    ) + "".join(
+        f"CREATE INDEX IF NOT EXISTS {index_name} ON {definition};\n"
+        for index_name, definition in SECONDARY_INDEXES.items()
+    )
     
     try:
         with db_manager.get_cursor() as cursor:
+            if _schema_ready(cursor):
+                logger.info("Database tables already initialized.")
+                return
+            
+            # Serialize DDL across workers starting at the same time; the lock is
+            # released at commit. A blocked DDL statement fails fast instead of hanging.
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext('meddocreader_ddl'))")
+            if _schema_ready(cursor):
+                logger.info("Database tables initialized by another worker.")
+                return
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
             cursor.execute(create_tables_sql)
+            if _bulk_load_running(cursor):
+                logger.info("Bulk load in progress; it will rebuild the secondary indexes.")
+            else:
+                cursor.execute(create_indexes_sql)
         logger.info("Database tables initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize database tables: {e}")
         raise
 
+
+def _schema_ready(cursor) -> bool:
+    """Check whether every table and index created by init_database already exists.
+    
+    Secondary indexes are not required while a bulk load has them dropped.
+    """
+    relations = list(SCHEMA_TABLES)
+    if not _bulk_load_running(cursor):
+        relations += list(SECONDARY_INDEXES)
+    cursor.execute(
+        "SELECT bool_and(to_regclass(relation) IS NOT NULL) FROM unnest(%s::text[]) AS relation",
+        (relations,)
+    )
+    return bool(cursor.fetchone()[0])
+
+
+def _bulk_load_running(cursor) -> bool:
+    """Check whether any session, in any process, holds one of the bulk load advisory locks."""
+    # Advisory locks on a bigint key appear in pg_locks split into classid (high) and objid (low)
+    cursor.execute(
+        """
+        SELECT EXISTS (
+            SELECT 1 FROM pg_locks
+            WHERE locktype = 'advisory' AND objsubid = 1
+              AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+              AND ((classid::bigint << 32) | objid::bigint) IN (hashtext(%s), hashtext(%s))
+        )
+        """,
+        (BULK_LOAD_ACTIVE_LOCK, BULK_LOAD_DDL_LOCK)
+    )
+    return cursor.fetchone()[0]
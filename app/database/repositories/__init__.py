@@ -3,46 +3,194 @@ Repository pattern for data access operations.
 Provides clean separation between business logic and data persistence.
 """
 
-from typing import List, Optional, Dict, Any
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
+import atexit
 import logging
+import threading
+from collections import deque
 
+import psycopg2.extras
+
+from app.config import db_config
 from app.database import db_manager
-from app.models import Document, PatientData, ProcessingStatus, ExtractedField
+from app.models import Document, DocumentSummary, ExtractedField, PatientData, ProcessingStatus
 
 
 logger = logging.getLogger(__name__)
 
 
+DOCUMENT_COLUMNS = (
+    'filename', 'file_path', 'file_size', 'mime_type',
+    'processing_status', 'extracted_text', 'processing_errors', 'metadata'
+)
+
+PATIENT_COLUMNS = (
+    'document_id', 'name', 'name_confidence', 'date_of_birth', 'dob_confidence',
+    'insurance_id', 'insurance_confidence', 'address', 'address_confidence',
+    'phone', 'phone_confidence', 'email', 'email_confidence'
+)
+
+PROCESSING_LOG_COLUMNS = ('document_id', 'status', 'message', 'processing_time', 'confidence_score')
+
+# (column, Document field, conversion) in the order document rows are selected
+DOCUMENT_ROW_MAPPING = (
+    ('id', 'id', '{}'),
+    ('filename', 'filename', '{}'),
+    ('file_path', 'file_path', '{}'),
+    ('file_size', 'file_size', '{}'),
+    ('mime_type', 'mime_type', '{}'),
+    ('upload_date', 'upload_date', '{}'),
+    ('processing_status', 'processing_status', 'ProcessingStatus({})'),
+    ('extracted_text', 'extracted_text', '({} or "")'),
+    ('processing_errors', 'processing_errors', '({} or [])'),
+    ('metadata', 'metadata', '({} or {{}})'),
+)
+
+# (value column, confidence column, PatientData field) in the order patient rows are selected
+PATIENT_ROW_MAPPING = (
+    ('name', 'name_confidence', 'name'),
+    ('date_of_birth', 'dob_confidence', 'date_of_birth'),
+    ('insurance_id', 'insurance_confidence', 'insurance_id'),
+    ('address', 'address_confidence', 'address'),
+    ('phone', 'phone_confidence', 'phone'),
+    ('email', 'email_confidence', 'email'),
+)
+
+# Names the generated row builders may refer to
+_ROW_BUILDER_NAMESPACE = {
+    'Document': Document,
+    'PatientData': PatientData,
+    'ExtractedField': ExtractedField,
+    'ProcessingStatus': ProcessingStatus,
+}
+
+DOCUMENT_SELECT = ", ".join(column for column, _, _ in DOCUMENT_ROW_MAPPING)
+
+PATIENT_SELECT = ", ".join(
+    f"{value_column}, {confidence_column}" for value_column, confidence_column, _ in PATIENT_ROW_MAPPING
+)
+
+
+def _compile_row_builder(name: str, expression: str) -> Callable[[tuple], Any]:
+    """Compile ``def name(row): return expression`` once at import time.
+    
+    The generated function indexes the row positionally and calls the model
+    constructor directly, avoiding per-row unpacking and attribute lookups.
+    """
+    source = f"def {name}(row):\n    return {expression}\n"
+    namespace: Dict[str, Any] = {}
+    exec(compile(source, f"<{name}>", "exec"), dict(_ROW_BUILDER_NAMESPACE), namespace)
+    return namespace[name]
+
+
+_build_document = _compile_row_builder(
+    '_build_document',
+    "Document(" + ", ".join(
+        f"{field_name}={conversion.format(f'row[{index}]')}"
+        for index, (_, field_name, conversion) in enumerate(DOCUMENT_ROW_MAPPING)
+    ) + ")"
+)
+
+_build_patient_data = _compile_row_builder(
+    '_build_patient_data',
+    "PatientData(" + ", ".join(
+        f"{field_name}=ExtractedField(row[{2 * index}], row[{2 * index + 1}] or 0.0)"
+        for index, (_, _, field_name) in enumerate(PATIENT_ROW_MAPPING)
+    ) + ")"
+)
+
+# Each branch matches a partial index (idx_documents_needs_review and
+# idx_patients_low_conf) instead of OR-ing both predicates over a join
+NEEDING_REVIEW_QUERY = f"""
+SELECT {DOCUMENT_SELECT} FROM (
+    SELECT DISTINCT ON (id) * FROM (
+        SELECT d.* FROM documents d
+        WHERE d.processing_status = 'needs_review'
+        UNION ALL
+        SELECT d.* FROM documents d
+        JOIN patients p ON d.id = p.document_id
+        WHERE p.name_confidence < 0.75 OR p.dob_confidence < 0.75 OR p.insurance_confidence < 0.75
+    ) candidates
+    ORDER BY id
+) review
+ORDER BY upload_date DESC
+"""
+
+# Hot queries executed as server-side prepared statements, keyed by statement name
+PREPARED_QUERIES = {
+    'doc_insert': """
+        INSERT INTO documents (filename, file_path, file_size, mime_type,
+                               processing_status, extracted_text, processing_errors, metadata)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        RETURNING id
+    """,
+    'doc_get_by_id': f"SELECT {DOCUMENT_SELECT} FROM documents WHERE id = $1",
+    # p.document_id is NULL when the document has no patient record yet
+    'doc_get_with_patient': f"""
+        SELECT {", ".join(f"d.{column}" for column, _, _ in DOCUMENT_ROW_MAPPING)}, p.document_id, {PATIENT_SELECT}
+        FROM documents d
+        LEFT JOIN LATERAL (
+            SELECT document_id, {PATIENT_SELECT} FROM patients
+            WHERE document_id = d.id
+            ORDER BY id DESC
+            LIMIT 1
+        ) p ON TRUE
+        WHERE d.id = $1
+    """,
+    'doc_get_by_status': f"SELECT {DOCUMENT_SELECT} FROM documents WHERE processing_status = $1 ORDER BY upload_date DESC",
+    'doc_recent_by_status': f"SELECT {DOCUMENT_SELECT} FROM documents WHERE processing_status = $1 ORDER BY upload_date DESC LIMIT $2",
+    'doc_summaries_by_status': "SELECT id, filename, upload_date FROM documents WHERE processing_status = $1 ORDER BY upload_date DESC",
+    # Both aggregates read only idx_documents_status_updated_at: max() is a single probe and
+    # count(*) an index-only scan of the status's entries. The count catches rows that are
+    # deleted or leave the status, which do not move max().
+    'doc_status_version': "SELECT max(updated_at), count(*) FROM documents WHERE processing_status = $1",
+    'doc_update_status': """
+        UPDATE documents
+        SET processing_status = $1, extracted_text = $2, processing_errors = $3, updated_at = CURRENT_TIMESTAMP
+        WHERE id = $4
+    """,
+    'patient_insert': """
+        INSERT INTO patients (document_id, name, name_confidence, date_of_birth, dob_confidence,
+                              insurance_id, insurance_confidence, address, address_confidence,
+                              phone, phone_confidence, email, email_confidence)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+        RETURNING id
+    """,
+    'patient_get_by_document_id': f"SELECT {PATIENT_SELECT} FROM patients WHERE document_id = $1",
+}
+
+
+def _prepared_query(name: str, params: tuple) -> List[tuple]:
+    """Run a SELECT/RETURNING statement from PREPARED_QUERIES."""
+    return db_manager.execute_prepared_query(name, PREPARED_QUERIES[name], params)
+
+
+def _prepared_update(name: str, params: tuple) -> int:
+    """Run an UPDATE/DELETE statement from PREPARED_QUERIES."""
+    return db_manager.execute_prepared_update(name, PREPARED_QUERIES[name], params)
+
+
 class DocumentRepository:
     """Repository for document-related database operations."""
     
     def create(self, document: Document) -> int:
         """Create a new document record."""
-        query = """
-        INSERT INTO documents (filename, file_path, file_size, mime_type, 
-                             processing_status, extracted_text, processing_errors, metadata)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-        """
-        params = (
-            document.filename,
-            document.file_path,
-            document.file_size,
-            document.mime_type,
-            document.processing_status.value,
-            document.extracted_text,
-            document.processing_errors,
-            document.metadata
-        )
+        params = self._document_params(document)
         
-        result = db_manager.execute_query(query, params)
-        return result[0]['id'] if result else None
+        result = _prepared_query('doc_insert', params)
+        return result[0][0] if result else None
+    
+    def bulk_create(self, documents: List[Document]) -> List[int]:
+        """Create many document records, using COPY for large batches and VALUES lists otherwise."""
+        rows = [self._document_params(document) for document in documents]
+        if len(rows) < db_config.copy_threshold:
+            return db_manager.insert_many('documents', DOCUMENT_COLUMNS, rows)
+        return db_manager.copy_insert('documents', DOCUMENT_COLUMNS, rows)
     
     def get_by_id(self, document_id: int) -> Optional[Document]:
         """Get document by ID."""
-        query = "SELECT * FROM documents WHERE id = %s"
-        result = db_manager.execute_query(query, (document_id,))
+        result = _prepared_query('doc_get_by_id', (document_id,))
         
         if not result:
             return None
@@ -50,61 +198,115 @@ class DocumentRepository:
         row = result[0]
         return self._row_to_document(row)
     
+    def get_with_patient(self, document_id: int) -> Tuple[Optional[Document], Optional[PatientData]]:
+        """Get a document and its latest patient data in one query.
+        
+        Returns (None, None) when the document does not exist, and
+        (document, None) when it has no patient record.
+        """
+        result = _prepared_query('doc_get_with_patient', (document_id,))
+        if not result:
+            return None, None
+        
+        row = result[0]
+        split = len(DOCUMENT_ROW_MAPPING)
+        document = self._row_to_document(row)
+        patient_data = _build_patient_data(row[split + 1:]) if row[split] is not None else None
+        return document, patient_data
+    
     def get_by_status(self, status: ProcessingStatus) -> List[Document]:
         """Get documents by processing status."""
-        query = "SELECT * FROM documents WHERE processing_status = %s ORDER BY upload_date DESC"
-        results = db_manager.execute_query(query, (status.value,))
-        return [self._row_to_document(row) for row in results]
+        results = _prepared_query('doc_get_by_status', (status.value,))
+        return list(map(_build_document, results))
+    
+    def get_recent_by_status(self, status: ProcessingStatus, limit: int) -> List[Document]:
+        """Get the most recently uploaded documents with a status, limited in SQL."""
+        results = _prepared_query('doc_recent_by_status', (status.value, limit))
+        return list(map(_build_document, results))
+    
+    def get_summaries_by_status(self, status: ProcessingStatus) -> List[DocumentSummary]:
+        """Get id, filename and upload date of documents with a status, skipping the heavy columns."""
+        results = _prepared_query('doc_summaries_by_status', (status.value,))
+        return [DocumentSummary(*row) for row in results]
+    
+    def get_status_version(self, status: ProcessingStatus) -> Tuple[Optional[datetime], int]:
+        """Return (latest updated_at, row count) for a status; changes whenever its documents do.
+        
+        Both values are read in the query's snapshot, so the version is exact as of commit.
+        """
+        result = _prepared_query('doc_status_version', (status.value,))
+        return result[0] if result else (None, 0)
+    
+    def iter_by_status(self, status: ProcessingStatus) -> Iterator[Document]:
+        """Stream documents by processing status without loading them all at once."""
+        query = f"SELECT {DOCUMENT_SELECT} FROM documents WHERE processing_status = %s ORDER BY upload_date DESC"
+        for row in db_manager.execute_query_stream(query, (status.value,)):
+            yield self._row_to_document(row)
     
     def get_needing_review(self) -> List[Document]:
         """Get documents that need human review."""
-        query = """
-        SELECT d.* FROM documents d
-        LEFT JOIN patients p ON d.id = p.document_id
-        WHERE d.processing_status = 'needs_review'
-        OR (p.name_confidence < 0.75 OR p.dob_confidence < 0.75 OR p.insurance_confidence < 0.75)
-        ORDER BY d.upload_date DESC
-        """
-        results = db_manager.execute_query(query)
-        return [self._row_to_document(row) for row in results]
+        results = db_manager.execute_query(NEEDING_REVIEW_QUERY)
+        return list(map(_build_document, results))
+    
+    def iter_needing_review(self) -> Iterator[Document]:
+        """Stream documents that need human review without loading them all at once."""
+        for row in db_manager.execute_query_stream(NEEDING_REVIEW_QUERY):
+            yield self._row_to_document(row)
     
     def update_status(self, document_id: int, status: ProcessingStatus, 
                      extracted_text: str = None, errors: List[str] = None) -> bool:
         """Update document processing status."""
-        query = """
-        UPDATE documents 
-        SET processing_status = %s, extracted_text = %s, processing_errors = %s, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-        """
         params = (status.value, extracted_text, errors, document_id)
-        affected_rows = db_manager.execute_update(query, params)
+        affected_rows = _prepared_update('doc_update_status', params)
+        return affected_rows > 0
+    
+    def save_results(self, document_id: int, status: ProcessingStatus,
+                     extracted_text: str, patient_data: PatientData) -> bool:
+        """Insert the patient record and set the final document status in a single transaction."""
+        statements = [
+            ('patient_insert', PREPARED_QUERIES['patient_insert'],
+             PatientRepository._patient_params(document_id, patient_data)),
+            ('doc_update_status', PREPARED_QUERIES['doc_update_status'],
+             (status.value, extracted_text, None, document_id)),
+        ]
+        _, affected_rows = db_manager.execute_prepared_transaction(statements)
         return affected_rows > 0
     
     def delete(self, document_id: int) -> bool:
         """Delete document and related records."""
-        # Delete patient data first (foreign key constraint)
-        patient_repo = PatientRepository()
-        patient_repo.delete_by_document_id(document_id)
+        return self.delete_many([document_id]) > 0
+    
+    def delete_many(self, document_ids: List[int]) -> int:
+        """Delete documents and their related records in one statement."""
+        if not document_ids:
+            return 0
         
-        # Delete document
-        query = "DELETE FROM documents WHERE id = %s"
-        affected_rows = db_manager.execute_update(query, (document_id,))
-        return affected_rows > 0
+        # Child rows are removed in the same statement so foreign keys hold at commit
+        query = """
+        WITH deleted_patients AS (
+            DELETE FROM patients WHERE document_id = ANY(%(ids)s)
+        ), deleted_logs AS (
+            DELETE FROM processing_logs WHERE document_id = ANY(%(ids)s)
+        )
+        DELETE FROM documents WHERE id = ANY(%(ids)s)
+        """
+        return db_manager.execute_update(query, {'ids': list(document_ids)})
     
-    def _row_to_document(self, row: Dict[str, Any]) -> Document:
-        """Convert database row to Document object."""
-        return Document(
-            id=row['id'],
-            filename=row['filename'],
-            file_path=row['file_path'],
-            file_size=row['file_size'],
-            mime_type=row['mime_type'],
-            upload_date=row['upload_date'],
-            processing_status=ProcessingStatus(row['processing_status']),
-            extracted_text=row['extracted_text'] or "",
-            processing_errors=row['processing_errors'] or [],
-            metadata=row['metadata'] or {}
+    def _document_params(self, document: Document) -> tuple:
+        """Build the insert parameters for a Document, ordered as DOCUMENT_COLUMNS."""
+        return (
+            document.filename,
+            document.file_path,
+            document.file_size,
+            document.mime_type,
+            document.processing_status.value,
+            document.extracted_text,
+            document.processing_errors,
+            document.metadata
         )
+    
+    # Row conversion is generated from DOCUMENT_ROW_MAPPING at import time
+    _row_to_document = staticmethod(_build_document)
 
 
 class PatientRepository:
@@ -112,36 +314,14 @@ class PatientRepository:
     
     def create(self, document_id: int, patient_data: PatientData) -> int:
         """Create patient record from extracted data."""
-        query = """
-        INSERT INTO patients (document_id, name, name_confidence, date_of_birth, dob_confidence,
-                             insurance_id, insurance_confidence, address, address_confidence,
-                             phone, phone_confidence, email, email_confidence)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING id
-        """
-        params = (
-            document_id,
-            patient_data.name.value,
-            patient_data.name.confidence,
-            patient_data.date_of_birth.value,
-            patient_data.date_of_birth.confidence,
-            patient_data.insurance_id.value,
-            patient_data.insurance_id.confidence,
-            patient_data.address.value,
-            patient_data.address.confidence,
-            patient_data.phone.value,
-            patient_data.phone.confidence,
-            patient_data.email.value,
-            patient_data.email.confidence
-        )
+        params = self._patient_params(document_id, patient_data)
         
-        result = db_manager.execute_query(query, params)
-        return result[0]['id'] if result else None
+        result = _prepared_query('patient_insert', params)
+        return result[0][0] if result else None
     
     def get_by_document_id(self, document_id: int) -> Optional[PatientData]:
         """Get patient data by document ID."""
-        query = "SELECT * FROM patients WHERE document_id = %s"
-        result = db_manager.execute_query(query, (document_id,))
+        result = _prepared_query('patient_get_by_document_id', (document_id,))
         
         if not result:
             return None
@@ -184,57 +364,159 @@ class PatientRepository:
         affected_rows = db_manager.execute_update(query, (document_id,))
         return affected_rows > 0
     
-    def _row_to_patient_data(self, row: Dict[str, Any]) -> PatientData:
-        """Convert database row to PatientData object."""
-        return PatientData(
-            name=ExtractedField(
-                value=row['name'],
-                confidence=row['name_confidence'] or 0.0
-            ),
-            date_of_birth=ExtractedField(
-                value=row['date_of_birth'],
-                confidence=row['dob_confidence'] or 0.0
-            ),
-            insurance_id=ExtractedField(
-                value=row['insurance_id'],
-                confidence=row['insurance_confidence'] or 0.0
-            ),
-            address=ExtractedField(
-                value=row['address'],
-                confidence=row['address_confidence'] or 0.0
-            ),
-            phone=ExtractedField(
-                value=row['phone'],
-                confidence=row['phone_confidence'] or 0.0
-            ),
-            email=ExtractedField(
-                value=row['email'],
-                confidence=row['email_confidence'] or 0.0
-            )
+    @staticmethod
+    def _patient_params(document_id: int, patient_data: PatientData) -> tuple:
+        """Build the insert parameters for PatientData, ordered as PATIENT_COLUMNS."""
+        return (
+            document_id,
+            patient_data.name.value,
+            patient_data.name.confidence,
+            patient_data.date_of_birth.value,
+            patient_data.date_of_birth.confidence,
+            patient_data.insurance_id.value,
+            patient_data.insurance_id.confidence,
+            patient_data.address.value,
+            patient_data.address.confidence,
+            patient_data.phone.value,
+            patient_data.phone.confidence,
+            patient_data.email.value,
+            patient_data.email.confidence
         )
+    
+    # Row conversion is generated from PATIENT_ROW_MAPPING at import time
+    _row_to_patient_data = staticmethod(_build_patient_data)
 
 
 class ProcessingLogRepository:
     """Repository for processing log operations."""
     
     def create_log(self, document_id: int, status: str, message: str = None,
-                  processing_time: float = 0.0, confidence_score: float = 0.0) -> int:
-        """Create a processing log entry."""
-        query = """
-        INSERT INTO processing_logs (document_id, status, message, processing_time, confidence_score)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id
+                  processing_time: float = 0.0, confidence_score: float = 0.0) -> Optional[int]:
+        """Queue a processing log entry for the next batched write.
+        
+        Returns None because the row id is only assigned when the buffer is flushed.
         """
-        params = (document_id, status, message, processing_time, confidence_score)
-        result = db_manager.execute_query(query, params)
-        return result[0]['id'] if result else None
+        log_buffer.append((document_id, status, message, processing_time, confidence_score))
+        return None
+    
+    def flush(self):
+        """Write queued log entries now instead of waiting for the next batched write."""
+        log_buffer.flush()
     
     def get_logs_by_document(self, document_id: int) -> List[Dict[str, Any]]:
         """Get processing logs for a document."""
+        # Make sure entries still waiting in the buffer are visible
+        log_buffer.flush()
         query = """
         SELECT * FROM processing_logs 
         WHERE document_id = %s 
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
+        """
+        return db_manager.execute_query(
+            query, (document_id,), cursor_factory=psycopg2.extras.RealDictCursor
+        )
+
+
+class ProcessingLogBuffer:
+    """Coalesces processing log rows in memory and writes them in batches.
+    
+    A background thread flushes the buffer every ``flush_interval`` seconds,
+    or sooner once ``flush_size`` rows are waiting. The thread is a daemon, so
+    owners of the process call ``flush`` before shutting down or closing the
+    connection pool; ``close`` also runs at interpreter exit to write what
+    is left.
+    
+    created_at is assigned by the database when a batch is written, as for every
+    other table, so it can trail the event by up to ``flush_interval``. Rows are
+    written in the order they were queued, so ids follow that order.
+    """
+    
+    COLUMNS = PROCESSING_LOG_COLUMNS
+    
+    def __init__(self, flush_interval: float, flush_size: int):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._rows = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._close_registered = False
+    
+    def append(self, row: tuple):
+        """Queue one row ordered as COLUMNS."""
+        with self._lock:
+            self._rows.append(row)
+            pending = len(self._rows)
+            if self._thread is None:
+                self._start()
+        
+        if pending >= self.flush_size:
+            self._wakeup.set()
+    
+    def flush(self):
+        """Write all queued rows to the database.
+        
+        If the batched write fails, the rows are retried one at a time so a
+        single bad row does not take the rest of the batch with it.
         """
-        return db_manager.execute_query(query, (document_id,))
+        with self._lock:
+            if not self._rows:
+                return
+            rows = list(self._rows)
+            self._rows.clear()
+        
+        try:
+            if len(rows) < db_config.copy_threshold:
+                db_manager.insert_many('processing_logs', self.COLUMNS, rows)
+            else:
+                db_manager.copy_insert('processing_logs', self.COLUMNS, rows)
+        except Exception as e:
+            logger.warning(f"Failed to write {len(rows)} processing log entries, retrying one by one: {e}")
+            for row in rows:
+                try:
+                    db_manager.insert_many('processing_logs', self.COLUMNS, [row])
+                except Exception as row_error:
+                    logger.error(f"Dropped processing log entry {row!r}: {row_error}")
+    
+    def close(self):
+        """Stop the background flush thread, then write the rows still queued.
+        
+        The thread is joined first so the final write cannot overlap one it
+        has in flight. Nothing is written once the connection pool has been
+        closed, since that would open a new pool during shutdown.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wakeup.set()
+            thread.join()
+        
+        if db_manager.is_connected:
+            self.flush()
+        elif self._rows:
+            logger.warning(f"Dropped {len(self._rows)} processing log entries queued after the pool was closed")
+    
+    def _start(self):
+        """Start the background flush thread; called with the lock held."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="processing-log-flush", daemon=True)
+        self._thread.start()
+        if not self._close_registered:
+            atexit.register(self.close)
+            self._close_registered = True
+    
+    def _run(self):
+        """Flush on a timer, or early when the buffer fills up, until close is called."""
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # close writes the remaining rows itself once this thread has exited
+            if self._stop.is_set():
+                return
+            self.flush()
+
 
+# Process-wide buffer shared by all ProcessingLogRepository instances
+log_buffer = ProcessingLogBuffer(db_config.log_flush_interval, db_config.log_flush_size)
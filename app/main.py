@@ -13,7 +13,10 @@ from app.web.routes import app
 
 
 def setup_logging():
-    """Configure application logging."""
+    """Configure application logging.
+    
+    Safe to call more than once; only the first call in a process installs handlers.
+    """
     logging.basicConfig(
         level=getattr(logging, config.log_level.upper()),
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -24,6 +27,10 @@ def setup_logging():
     )
 
 
+# Each uvicorn worker imports this module, so it configures its own logging at startup
+app.add_event_handler("startup", setup_logging)
+
+
 def create_app():
     """Create and configure the FastAPI application."""
     # Setup logging
@@ -33,7 +40,7 @@ def create_app():
     init_database()
     
     # Create necessary directories
-    Path("uploads").mkdir(exist_ok=True)
+    Path(config.upload_dir).mkdir(parents=True, exist_ok=True)
     Path("app/web/templates").mkdir(parents=True, exist_ok=True)
     Path("app/web/static").mkdir(parents=True, exist_ok=True)
     
@@ -41,13 +48,19 @@ def create_app():
 
 
 if __name__ == "__main__":
-    app_instance = create_app()
+    # Initialize the database and directories once, before any worker starts
+    create_app()
     
     import uvicorn
+    # Workers and reload need an import string; "auto" picks uvloop and httptools where
+    # uvicorn[standard] could install them and falls back to asyncio and h11 elsewhere (e.g. Windows)
     uvicorn.run(
-        app_instance,
+        "app.main:app",
         host=config.host,
         port=config.port,
-        reload=config.debug
+        reload=config.debug,
+        workers=1 if config.debug else config.workers,
+        loop="auto",
+        http="auto"
     )
 
@@ -5,9 +5,11 @@ Defines the structure for documents, patients, and processing results.
 
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from enum import Enum
 
+import numpy as np
+
 
 class ProcessingStatus(Enum):
     """Status of document processing."""
@@ -25,30 +27,34 @@ class ConfidenceLevel(Enum):
     LOW = "low"        # < 0.5
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ExtractedField:
-    """Represents an extracted field with confidence score."""
+    """Represents an extracted field with confidence score.
+    
+    Fields are immutable, so the confidence level and review flag are
+    computed once at construction rather than on every access.
+    """
     value: Optional[str] = None
     confidence: float = 0.0
     raw_text: Optional[str] = None
+    confidence_level: ConfidenceLevel = field(init=False, repr=False, compare=False)
+    needs_review: bool = field(init=False, repr=False, compare=False)
     
-    @property
-    def confidence_level(self) -> ConfidenceLevel:
-        """Get confidence level based on score."""
+    def __post_init__(self):
         if self.confidence >= 0.8:
-            return ConfidenceLevel.HIGH
+            level = ConfidenceLevel.HIGH
         elif self.confidence >= 0.5:
-            return ConfidenceLevel.MEDIUM
+            level = ConfidenceLevel.MEDIUM
         else:
-            return ConfidenceLevel.LOW
-    
-    @property
-    def needs_review(self) -> bool:
-        """Check if field needs human review."""
-        return self.confidence < 0.75
+            level = ConfidenceLevel.LOW
+        object.__setattr__(self, 'confidence_level', level)
+        object.__setattr__(self, 'needs_review', self.confidence < 0.75)
 
 
-@dataclass
+PATIENT_FIELD_NAMES = ('name', 'date_of_birth', 'insurance_id', 'address', 'phone', 'email')
+
+
+@dataclass(slots=True)
 class PatientData:
     """Patient information extracted from documents."""
     name: ExtractedField = field(default_factory=ExtractedField)
@@ -60,18 +66,51 @@ class PatientData:
     
     def get_low_confidence_fields(self) -> Dict[str, ExtractedField]:
         """Get fields that need human review."""
-        fields = {
-            'name': self.name,
-            'date_of_birth': self.date_of_birth,
-            'insurance_id': self.insurance_id,
-            'address': self.address,
-            'phone': self.phone,
-            'email': self.email
-        }
-        return {k: v for k, v in fields.items() if v.needs_review}
-
-
-@dataclass
+        fields = {}
+        for name in PATIENT_FIELD_NAMES:
+            extracted = getattr(self, name)
+            if extracted.needs_review:
+                fields[name] = extracted
+        return fields
+    
+    def has_low_confidence_fields(self) -> bool:
+        """Check if any field needs human review without building a mapping."""
+        return any(getattr(self, name).needs_review for name in PATIENT_FIELD_NAMES)
+    
+    def overall_confidence(self) -> float:
+        """Average confidence of the extracted (non-zero) fields of this record."""
+        # Single pass, excluding fields that were not extracted
+        total = 0.0
+        count = 0
+        for name in PATIENT_FIELD_NAMES:
+            confidence = getattr(self, name).confidence
+            if confidence > 0:
+                total += confidence
+                count += 1
+        return total / count if count else 0.0
+    
+    @staticmethod
+    def mean_confidence(patient_data_list: List['PatientData']) -> np.ndarray:
+        """Average the extracted (non-zero) field confidences of many records in one vectorized pass.
+        
+        Computed in float64, so each value equals overall_confidence() of its record.
+        """
+        field_count = len(PATIENT_FIELD_NAMES)
+        confidences = np.fromiter(
+            (
+                getattr(patient_data, name).confidence
+                for patient_data in patient_data_list
+                for name in PATIENT_FIELD_NAMES
+            ),
+            dtype=np.float64,
+            count=len(patient_data_list) * field_count
+        ).reshape(len(patient_data_list), field_count)
+        
+        extracted = confidences > 0
+        return (confidences * extracted).sum(axis=1) / np.maximum(extracted.sum(axis=1), 1)
+
+
+@dataclass(slots=True)
 class Document:
     """Represents a medical document."""
     id: Optional[int] = None
@@ -91,7 +130,7 @@ class Document:
         """Check if document needs human review."""
         return (
             self.processing_status == ProcessingStatus.NEEDS_REVIEW or
-            bool(self.patient_data.get_low_confidence_fields())
+            self.patient_data.has_low_confidence_fields()
         )
     
     @property
@@ -100,7 +139,15 @@ class Document:
         return self.processing_status in [ProcessingStatus.COMPLETED, ProcessingStatus.NEEDS_REVIEW]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class DocumentSummary:
+    """Lightweight document listing entry, without the text and patient data."""
+    id: int
+    filename: str
+    upload_date: datetime
+
+
+@dataclass(slots=True)
 class ProcessingResult:
     """Result of document processing operation."""
     document_id: int
@@ -115,17 +162,11 @@ class ProcessingResult:
         """Calculate overall confidence score."""
         if not self.extracted_data:
             return 0.0
-        
-        fields = [
-            self.extracted_data.name.confidence,
-            self.extracted_data.date_of_birth.confidence,
-            self.extracted_data.insurance_id.confidence,
-            self.extracted_data.address.confidence,
-            self.extracted_data.phone.confidence,
-            self.extracted_data.email.confidence
-        ]
-        
-        # Calculate average confidence, excluding None values
-        valid_confidences = [c for c in fields if c > 0]
-        return sum(valid_confidences) / len(valid_confidences) if valid_confidences else 0.0
-
+        return self.extracted_data.overall_confidence()
+    
+    @classmethod
+    def mean_confidence(cls, results: List['ProcessingResult']) -> np.ndarray:
+        """Calculate overall_confidence for many results in one vectorized pass."""
+        return PatientData.mean_confidence(
+            [result.extracted_data or PatientData() for result in results]
+        )
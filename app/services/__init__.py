@@ -3,23 +3,132 @@ Service layer for MedDocReader application.
 Contains business logic for document processing, NLP analysis, and data management.
 """
 
+import copy
+import hashlib
 import os
+import threading
 import time
 import logging
-from typing import List, Optional, Dict, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import lru_cache
+from typing import Iterator, List, Optional, Dict, Tuple, TypeVar, Union
 from pathlib import Path
+from types import MappingProxyType
 
 from azure.ai.formrecognizer import DocumentAnalysisClient
 from azure.core.credentials import AzureKeyCredential
+from azure.core.polling import LROPoller
 import spacy
+from spacy.language import Language
 
 from app.config import azure_config, nlp_config, config
 from app.models import Document, PatientData, ExtractedField, ProcessingStatus, ProcessingResult
+from app.database import db_manager
 from app.database.repositories import DocumentRepository, PatientRepository, ProcessingLogRepository
+# compile_pattern uses RE2 when installed; see app.utils for how both engines are kept in step
+from app.utils import TextUtils, compile_pattern
 
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+# Patterns used by NLPService, compiled once at import time
+_DATE_CLEAN_RE = compile_pattern(r"[^0-9\-/]")
+# Case-insensitive via an inline flag; google-re2 has no IGNORECASE constant
+_INSURANCE_RE = compile_pattern(r"(?i)(?:insurance|policy|member\s*id)\s*[#:]?\s*([A-Z0-9\-]+)")
+_PHONE_RE = compile_pattern(r"\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})")
+_EMAIL_RE = compile_pattern(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b")
+
+# Literals that every _INSURANCE_RE match contains, checked before running the regex
+_INSURANCE_KEYWORDS = ("insurance", "policy", "member")
+
+# MIME types by lowercase file extension
+_MIME_TYPES = MappingProxyType({
+    '.pdf': 'application/pdf',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.tiff': 'image/tiff'
+})
+
+# spaCy components needed for entity extraction; everything else is disabled
+_ENTITY_PIPES = ("ner",)
+# Shared embedding components, kept only when an enabled component listens to them
+_EMBEDDING_PIPES = ("tok2vec", "transformer")
+# Entity labels mapped onto PatientData fields
+_ENTITY_LABELS = frozenset(("PERSON", "DATE"))
+
+# entity_ruler patterns used instead of the statistical NER when nlp_config.use_rule_based_ner is set
+_MONTHS = [
+    "jan", "january", "feb", "february", "mar", "march", "apr", "april", "may", "jun", "june",
+    "jul", "july", "aug", "august", "sep", "sept", "september", "oct", "october",
+    "nov", "november", "dec", "december"
+]
+_ENTITY_RULER_PATTERNS = [
+    # Honorific followed by one to three capitalized names, e.g. "Mrs. Jane Doe", "Mr. John Q Public".
+    # The tokenizer keeps "Mrs." as one token but may split the period off others.
+    {"label": "PERSON", "pattern": [
+        {"LOWER": {"IN": ["mr", "mrs", "ms", "miss", "dr", "mr.", "mrs.", "ms.", "dr."]}},
+        {"ORTH": ".", "OP": "?"},
+        {"IS_TITLE": True},
+        {"IS_TITLE": True, "OP": "?"},
+        {"IS_TITLE": True, "OP": "?"}
+    ]},
+    # Numeric dates, e.g. "01/02/1990"; slashed dates stay a single token
+    {"label": "DATE", "pattern": [{"TEXT": {"REGEX": r"^(\d{1,2}[/-]\d{1,2}[/-]\d{2,4}|\d{4}[/-]\d{1,2}[/-]\d{1,2})$"}}]},
+    # Hyphenated dates, e.g. "01-02-1990", "1990-01-02", which the tokenizer splits at each hyphen
+    {"label": "DATE", "pattern": [
+        {"SHAPE": {"IN": ["d", "dd"]}}, {"ORTH": "-"}, {"SHAPE": {"IN": ["d", "dd"]}}, {"ORTH": "-"},
+        {"SHAPE": {"IN": ["dd", "dddd"]}}
+    ]},
+    {"label": "DATE", "pattern": [
+        {"SHAPE": "dddd"}, {"ORTH": "-"}, {"SHAPE": {"IN": ["d", "dd"]}}, {"ORTH": "-"}, {"SHAPE": {"IN": ["d", "dd"]}}
+    ]},
+    # Month-name dates, e.g. "January 2, 1990", "2 January 1990"
+    {"label": "DATE", "pattern": [
+        {"LOWER": {"IN": _MONTHS}}, {"IS_DIGIT": True}, {"ORTH": ",", "OP": "?"}, {"SHAPE": "dddd"}
+    ]},
+    {"label": "DATE", "pattern": [
+        {"IS_DIGIT": True}, {"LOWER": {"IN": _MONTHS}}, {"SHAPE": "dddd"}
+    ]},
+]
+
+
+def _filled(items: List[Optional[T]]) -> List[T]:
+    """Return a list of None placeholders that have all been filled in, typed without the None."""
+    filled = [item for item in items if item is not None]
+    assert len(filled) == len(items), "a placeholder was left unfilled"
+    return filled
+
+
+@lru_cache(maxsize=None)
+def _load_spacy(model_name: str, enabled_pipes: Tuple[str, ...], rule_based: bool = False) -> Language:
+    """Load a spaCy model once per process with only ``enabled_pipes`` active.
+    
+    With ``rule_based`` an entity_ruler built from ``_ENTITY_RULER_PATTERNS``
+    is appended, so entities can be found without any statistical components.
+    
+    The pipeline is shared by every NLPService instance. It is safe to run
+    inference on from several threads, but components must not be added or
+    removed on it.
+    """
+    nlp = spacy.load(model_name)
+    enabled = [name for name in enabled_pipes if name in nlp.pipe_names]
+    # In en_core_web_sm, NER embeds tokens itself and tok2vec only feeds the tagger and parser
+    enabled += [
+        name for name in _EMBEDDING_PIPES
+        if name in nlp.pipe_names and set(nlp.get_pipe(name).listening_components) & set(enabled)
+    ]
+    nlp.select_pipes(enable=enabled)
+    if rule_based:
+        ruler = nlp.add_pipe("entity_ruler", name="patient_entity_ruler")
+        ruler.add_patterns(_ENTITY_RULER_PATTERNS)
+    logger.info(f"SpaCy model '{model_name}' loaded successfully with pipes {nlp.pipe_names}.")
+    return nlp
+
 
 class AzureFormRecognizerService:
     """Service for Azure Form Recognizer operations."""
@@ -30,23 +139,38 @@ class AzureFormRecognizerService:
             credential=AzureKeyCredential(azure_config.form_recognizer_key)
         )
     
+    def submit_document(self, file_path: str) -> LROPoller:
+        """Start analysis of a document and return its poller without waiting for the result."""
+        with open(file_path, "rb") as f:
+            return self.client.begin_analyze_document("prebuilt-document", document=f)
+    
+    def collect_results(self, pollers: Dict[str, LROPoller]) -> Dict[str, Optional[str]]:
+        """Wait for submitted analyses and return the extracted text for each file path.
+        
+        Azure works on all submitted documents at once, so waiting on them in turn
+        takes about as long as the slowest one rather than the sum of all of them.
+        """
+        return {file_path: self._result_text(file_path, poller) for file_path, poller in pollers.items()}
+    
     def extract_text_from_document(self, file_path: str) -> Optional[str]:
         """Extract text from document using Azure Form Recognizer."""
         try:
-            with open(file_path, "rb") as f:
-                poller = self.client.begin_analyze_document("prebuilt-document", document=f)
-                result = poller.result()
-                
-                # Combine all text lines from all pages
-                text_lines = []
-                for page in result.pages:
-                    for line in page.lines:
-                        text_lines.append(line.content)
-                
-                extracted_text = " ".join(text_lines)
-                logger.info(f"Successfully extracted text from {file_path}")
-                return extracted_text
-                
+            poller = self.submit_document(file_path)
+        except Exception as e:
+            logger.error(f"Error extracting text from {file_path}: {e}")
+            return None
+        return self._result_text(file_path, poller)
+    
+    def _result_text(self, file_path: str, poller: LROPoller) -> Optional[str]:
+        """Wait for an analysis to finish and combine its text."""
+        try:
+            result = poller.result()
+            
+            # Combine all text lines from all pages
+            extracted_text = " ".join(line.content for page in result.pages for line in page.lines)
+            logger.info(f"Successfully extracted text from {file_path}")
+            return extracted_text
+            
         except Exception as e:
             logger.error(f"Error extracting text from {file_path}: {e}")
             return None
@@ -57,61 +181,30 @@ class NLPService:
     
     def __init__(self):
         try:
-            self.nlp = spacy.load(nlp_config.model_name)
-            logger.info(f"SpaCy model '{nlp_config.model_name}' loaded successfully.")
+            # Only doc.ents is used, so run just the entity recognizer and its embeddings
+            if nlp_config.use_rule_based_ner:
+                # Tokenizer and rules only; skips the tok2vec/NER forward pass entirely
+                self.nlp = _load_spacy(nlp_config.model_name, (), rule_based=True)
+            else:
+                self.nlp = _load_spacy(nlp_config.model_name, _ENTITY_PIPES)
         except Exception as e:
             logger.error(f"Failed to load SpaCy model: {e}")
             raise
+        
+        # LRU cache of results keyed by a hash of the text, so reprocessed documents skip NLP
+        self._cache: "OrderedDict[bytes, PatientData]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def extract_patient_data(self, text: str) -> PatientData:
         """Extract patient information from text using NLP."""
+        key = self._cache_key(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            doc = self.nlp(text)
-            patient_data = PatientData()
-            
-            # Extract entities
-            for ent in doc.ents:
-                if ent.label_ == "PERSON":
-                    patient_data.name = ExtractedField(
-                        value=ent.text.strip(),
-                        confidence=0.8,
-                        raw_text=ent.text
-                    )
-                elif ent.label_ == "DATE":
-                    # Clean date format
-                    cleaned_date = self._clean_date(ent.text)
-                    patient_data.date_of_birth = ExtractedField(
-                        value=cleaned_date,
-                        confidence=0.7,
-                        raw_text=ent.text
-                    )
-            
-            # Extract insurance information using pattern matching
-            insurance_info = self._extract_insurance_info(text)
-            if insurance_info:
-                patient_data.insurance_id = ExtractedField(
-                    value=insurance_info,
-                    confidence=0.6,
-                    raw_text=insurance_info
-                )
-            
-            # Extract contact information
-            phone = self._extract_phone(text)
-            if phone:
-                patient_data.phone = ExtractedField(
-                    value=phone,
-                    confidence=0.7,
-                    raw_text=phone
-                )
-            
-            email = self._extract_email(text)
-            if email:
-                patient_data.email = ExtractedField(
-                    value=email,
-                    confidence=0.9,
-                    raw_text=email
-                )
-            
+            patient_data = self._to_patient_data(self.nlp(text), text)
+            self._cache_put(key, patient_data)
             logger.info("Successfully extracted patient data using NLP")
             return patient_data
             
@@ -119,42 +212,138 @@ class NLPService:
             logger.error(f"Error during NLP processing: {e}")
             return PatientData()
     
+    def extract_patient_data_batch(self, texts: List[str]) -> List[PatientData]:
+        """Extract patient information from many texts, streaming them through spaCy in batches."""
+        try:
+            keys = [self._cache_key(text) for text in texts]
+            results = [self._cache_get(key) for key in keys]
+            misses = [index for index, result in enumerate(results) if result is None]
+            
+            docs = self.nlp.pipe((texts[index] for index in misses), batch_size=nlp_config.pipe_batch_size)
+            for index, doc in zip(misses, docs):
+                patient_data = self._to_patient_data(doc, texts[index])
+                results[index] = patient_data
+                self._cache_put(keys[index], patient_data)
+            
+            logger.info(
+                f"Successfully extracted patient data for {len(results)} documents using NLP "
+                f"({len(results) - len(misses)} from cache)"
+            )
+            return _filled(results)
+            
+        except Exception as e:
+            # Fall back to one document at a time so a single bad text only affects itself
+            logger.error(f"Error during batch NLP processing, retrying per document: {e}")
+            return [self.extract_patient_data(text) for text in texts]
+    
+    def _to_patient_data(self, doc, text: str) -> PatientData:
+        """Build PatientData from a processed spaCy doc and its source text."""
+        # Keep the first entity of each label; the document header names the patient
+        by_label = {}
+        for ent in doc.ents:
+            label = ent.label_
+            if label in _ENTITY_LABELS and label not in by_label:
+                by_label[label] = ent
+                if len(by_label) == len(_ENTITY_LABELS):
+                    break
+        
+        fields = {}
+        person = by_label.get("PERSON")
+        if person is not None:
+            fields["name"] = ExtractedField(
+                value=person.text.strip(),
+                confidence=0.8,
+                raw_text=person.text
+            )
+        
+        date = by_label.get("DATE")
+        if date is not None:
+            # Clean date format
+            fields["date_of_birth"] = ExtractedField(
+                value=self._clean_date(date.text),
+                confidence=0.7,
+                raw_text=date.text
+            )
+        
+        # OCR output often has no-break spaces, which RE2's \s does not match
+        text = TextUtils.normalize_spaces(text)
+        
+        # Extract insurance information using pattern matching
+        insurance_info = self._extract_insurance_info(text)
+        if insurance_info:
+            fields["insurance_id"] = ExtractedField(
+                value=insurance_info,
+                confidence=0.6,
+                raw_text=insurance_info
+            )
+        
+        # Extract contact information
+        phone = self._extract_phone(text)
+        if phone:
+            fields["phone"] = ExtractedField(
+                value=phone,
+                confidence=0.7,
+                raw_text=phone
+            )
+        
+        email = self._extract_email(text)
+        if email:
+            fields["email"] = ExtractedField(
+                value=email,
+                confidence=0.9,
+                raw_text=email
+            )
+        
+        return PatientData(**fields)
+    
+    def _cache_key(self, text: str) -> bytes:
+        """Hash text into a compact cache key."""
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    
+    def _cache_get(self, key: bytes) -> Optional[PatientData]:
+        """Return a copy of the cached result for key, if any."""
+        with self._cache_lock:
+            patient_data = self._cache.get(key)
+            if patient_data is None:
+                return None
+            self._cache.move_to_end(key)
+        # ExtractedField is immutable, so a shallow copy keeps callers from touching the cached entry
+        return copy.copy(patient_data)
+    
+    def _cache_put(self, key: bytes, patient_data: PatientData):
+        """Cache a copy of patient_data, evicting the least recently used entry when full."""
+        with self._cache_lock:
+            self._cache[key] = copy.copy(patient_data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > nlp_config.cache_size:
+                self._cache.popitem(last=False)
+    
     def _clean_date(self, date_text: str) -> str:
         """Clean and format date text."""
-        import re
         # Remove non-numeric characters except hyphens and slashes
-        cleaned = re.sub(r"[^0-9\-/]", "", date_text)
-        return cleaned
+        return _DATE_CLEAN_RE.sub("", date_text)
     
     def _extract_insurance_info(self, text: str) -> Optional[str]:
         """Extract insurance information using pattern matching."""
-        import re
-        patterns = [
-            r"insurance\s*[#:]?\s*([A-Z0-9\-]+)",
-            r"policy\s*[#:]?\s*([A-Z0-9\-]+)",
-            r"member\s*id\s*[#:]?\s*([A-Z0-9\-]+)",
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        return None
+        # A substring search is far cheaper than the case-insensitive regex on texts without a keyword
+        lowered = text.lower()
+        if not any(keyword in lowered for keyword in _INSURANCE_KEYWORDS):
+            return None
+        match = _INSURANCE_RE.search(text)
+        return match.group(1) if match else None
     
     def _extract_phone(self, text: str) -> Optional[str]:
         """Extract phone number using pattern matching."""
-        import re
-        phone_pattern = r"\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})"
-        match = re.search(phone_pattern, text)
+        match = _PHONE_RE.search(text)
         if match:
             return f"({match.group(1)}) {match.group(2)}-{match.group(3)}"
         return None
     
     def _extract_email(self, text: str) -> Optional[str]:
         """Extract email address using pattern matching."""
-        import re
-        email_pattern = r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b"
-        match = re.search(email_pattern, text)
+        if "@" not in text:
+            return None
+        match = _EMAIL_RE.search(text)
         return match.group(0) if match else None
 
 
@@ -168,117 +357,269 @@ class DocumentProcessingService:
         self.patient_repo = PatientRepository()
         self.log_repo = ProcessingLogRepository()
     
-    def process_document(self, file_path: str) -> ProcessingResult:
-        """Process a single document through the complete workflow."""
+    def process_document(self, file_path: str, filename: Optional[str] = None) -> ProcessingResult:
+        """Process a single document through the complete workflow.
+        
+        ``filename`` is recorded instead of the stored file's name when given,
+        e.g. the original name of an upload saved under a generated name.
+        """
         start_time = time.time()
+        document_id = None
         
         try:
-            # Create document record
-            document = self._create_document_from_file(file_path)
-            document_id = self.document_repo.create(document)
-            document.id = document_id
-            
-            # Update status to processing
-            self.document_repo.update_status(document_id, ProcessingStatus.PROCESSING)
-            self.log_repo.create_log(document_id, "processing", "Started document processing")
-            
-            # Extract text using Azure Form Recognizer
-            extracted_text = self.azure_service.extract_text_from_document(file_path)
-            if not extracted_text or extracted_text.strip() == "":
-                raise Exception("No text extracted from document")
-            
-            # Update document with extracted text
-            self.document_repo.update_status(
-                document_id, 
-                ProcessingStatus.PROCESSING, 
-                extracted_text=extracted_text
-            )
+            document_id = self._start_document(file_path, filename=filename)
+            extracted_text = self._extract_text(file_path)
             
             # Extract patient data using NLP
             patient_data = self.nlp_service.extract_patient_data(extracted_text)
             
-            # Save patient data
-            self.patient_repo.create(document_id, patient_data)
-            
-            # Determine final status
-            processing_time = time.time() - start_time
-            confidence_score = self._calculate_overall_confidence(patient_data)
-            
-            if patient_data.get_low_confidence_fields():
-                final_status = ProcessingStatus.NEEDS_REVIEW
-                message = "Document processed but needs human review for low-confidence fields"
-            else:
-                final_status = ProcessingStatus.COMPLETED
-                message = "Document processed successfully"
-            
-            # Update final status
-            self.document_repo.update_status(document_id, final_status, extracted_text)
-            self.log_repo.create_log(
-                document_id, 
-                final_status.value, 
-                message, 
-                processing_time, 
-                confidence_score
-            )
-            
-            return ProcessingResult(
-                document_id=document_id,
-                success=True,
-                extracted_data=patient_data,
-                processing_time=processing_time,
-                confidence_score=confidence_score
-            )
+            return self._finalize_document(document_id, extracted_text, patient_data, start_time)
             
         except Exception as e:
-            processing_time = time.time() - start_time
-            error_message = f"Error processing document: {str(e)}"
-            logger.error(error_message)
-            
-            if document_id:
-                self.document_repo.update_status(
-                    document_id, 
-                    ProcessingStatus.FAILED, 
-                    errors=[error_message]
-                )
-                self.log_repo.create_log(document_id, "failed", error_message, processing_time)
-            
-            return ProcessingResult(
-                document_id=document_id or 0,
-                success=False,
-                errors=[error_message],
-                processing_time=processing_time
-            )
+            return self._fail_document(document_id, e, start_time)
     
     def process_batch(self, folder_path: str) -> List[ProcessingResult]:
-        """Process multiple documents from a folder."""
-        results = []
+        """Process multiple documents from a folder.
+        
+        Meant for offline imports, so large folders run in bulk load mode.
+        """
+        try:
+            return list(self.iter_batch(self.list_batch_files(folder_path), bulk_load=True))
+        finally:
+            # Offline callers often exit right away, before the background log flush runs
+            self.log_repo.flush()
+    
+    def list_batch_files(self, folder_path: str) -> List[os.DirEntry]:
+        """List the supported files in a folder, in directory order."""
         folder = Path(folder_path)
         
         if not folder.exists():
             raise ValueError(f"Folder path does not exist: {folder_path}")
         
-        # Get all supported files
-        supported_files = []
-        for ext in config.supported_formats:
-            supported_files.extend(folder.glob(f"*{ext}"))
-            supported_files.extend(folder.glob(f"*{ext.upper()}"))
+        # Get all supported files in a single directory pass, matching extensions case-insensitively.
+        # The DirEntry objects are kept so their stat results can be reused when creating records.
+        with os.scandir(folder) as entries:
+            supported_files = [
+                entry for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in config.supported_formats
+            ]
         
         logger.info(f"Found {len(supported_files)} files to process")
+        return supported_files
+    
+    def iter_batch(self, files: List[os.DirEntry], bulk_load: bool = False) -> Iterator[ProcessingResult]:
+        """Process files in chunks of config.batch_size, yielding results in file order.
+        
+        Files within a chunk are analyzed by Azure concurrently; chunking bounds
+        the number of in-flight analyses and lets callers see results before the
+        whole batch is done. With ``bulk_load``, batches of at least
+        config.bulk_load_min_files run in bulk load mode; this drops indexes for
+        every reader, so web requests leave it off.
+        """
+        with ExitStack() as stack:
+            # Large imports skip per-row index maintenance and rebuild indexes once at the end
+            if bulk_load and len(files) >= config.bulk_load_min_files:
+                try:
+                    stack.enter_context(db_manager.bulk_load_mode())
+                except TimeoutError as e:
+                    logger.warning(f"Importing without bulk load mode: {e}")
+            
+            for start in range(0, len(files), config.batch_size):
+                chunk = files[start:start + config.batch_size]
+                for entry, result in zip(chunk, self._process_files(chunk)):
+                    logger.info(f"Processed {entry.name}: {result.success}")
+                    yield result
+    
+    def _process_files(self, files: List[os.DirEntry]) -> List[ProcessingResult]:
+        """Run files through the workflow stage by stage so NLP can process them in batches."""
+        results: List[Optional[ProcessingResult]] = [None] * len(files)
+        
+        # Stage 1: create every record with one bulk insert, then submit the files to Azure
+        # without waiting. Uploading files is I/O-bound, so it runs on a thread pool.
+        started = []
+        for index, outcome in enumerate(self._start_documents(files)):
+            if isinstance(outcome, ProcessingResult):
+                results[index] = outcome
+            else:
+                started.append((index, *outcome))
+        
+        submitted = []
+        # Workers write the same way as this thread when it is in bulk load mode
+        initializer = db_manager.join_bulk_load if db_manager.bulk_loading else None
+        with ThreadPoolExecutor(max_workers=azure_config.max_workers, initializer=initializer) as executor:
+            futures = {
+                executor.submit(self._submit_document, document_id, file_path, start_time):
+                    (index, document_id, file_path, start_time)
+                for index, document_id, file_path, start_time in started
+            }
+            for future in as_completed(futures):
+                index, document_id, file_path, start_time = futures[future]
+                submission = future.result()
+                if isinstance(submission, ProcessingResult):
+                    results[index] = submission
+                else:
+                    submitted.append((index, document_id, file_path, submission, start_time))
+        
+        # Keep the remaining stages in file order
+        submitted.sort(key=lambda item: item[0])
+        
+        # Stage 2: collect the Azure results, which were analyzed concurrently
+        extracted_texts = self.azure_service.collect_results(
+            {file_path: poller for _, _, file_path, poller, _ in submitted}
+        )
+        extracted = []
+        for index, document_id, file_path, _, start_time in submitted:
+            try:
+                extracted_text = self._check_extracted_text(extracted_texts[file_path])
+                extracted.append((index, document_id, extracted_text, start_time))
+            except Exception as e:
+                results[index] = self._fail_document(document_id, e, start_time)
+        
+        # Stage 3: run all extracted texts through spaCy together
+        texts = [extracted_text for _, _, extracted_text, _ in extracted]
+        patient_data_list = self.nlp_service.extract_patient_data_batch(texts)
+        
+        # Stage 4: score the whole batch at once, then save patient data and final status
+        confidence_scores = PatientData.mean_confidence(patient_data_list).tolist()
+        for (index, document_id, extracted_text, start_time), patient_data, confidence_score in zip(
+            extracted, patient_data_list, confidence_scores
+        ):
+            try:
+                results[index] = self._finalize_document(
+                    document_id, extracted_text, patient_data, start_time, confidence_score
+                )
+            except Exception as e:
+                results[index] = self._fail_document(document_id, e, start_time)
+        
+        return _filled(results)
+    
+    def _start_documents(self, files: List[os.DirEntry]) -> List[Union[Tuple[int, str, float], ProcessingResult]]:
+        """Create the records for a chunk of files with one bulk insert, already marked as processing.
+        
+        Returns (document_id, file_path, start_time) for each file, or its failed
+        ProcessingResult if the file could not be read, e.g. because it disappeared
+        since it was listed. Every file fails if the insert itself does.
+        """
+        start_time = time.time()
+        outcomes: List[Union[Tuple[int, str, float], ProcessingResult, None]] = [None] * len(files)
+        indexes = []
+        documents = []
+        for index, entry in enumerate(files):
+            try:
+                document = self._create_document_from_file(entry.path, entry.stat())
+            except Exception as e:
+                outcomes[index] = self._fail_document(None, e, start_time)
+                continue
+            document.processing_status = ProcessingStatus.PROCESSING
+            indexes.append(index)
+            documents.append(document)
+        
+        try:
+            document_ids = self.document_repo.bulk_create(documents)
+        except Exception as e:
+            for index in indexes:
+                outcomes[index] = self._fail_document(None, e, start_time)
+            return _filled(outcomes)
+        
+        for index, document_id in zip(indexes, document_ids):
+            self.log_repo.create_log(document_id, "processing", "Started document processing")
+            outcomes[index] = (document_id, files[index].path, start_time)
+        return _filled(outcomes)
+    
+    def _submit_document(self, document_id: int, file_path: str,
+                         start_time: float) -> Union[LROPoller, ProcessingResult]:
+        """Submit a file to Azure, returning its poller or the failed ProcessingResult."""
+        try:
+            return self.azure_service.submit_document(file_path)
+        except Exception as e:
+            return self._fail_document(document_id, e, start_time)
+    
+    def _start_document(self, file_path: str, file_stat: Optional[os.stat_result] = None,
+                        filename: Optional[str] = None) -> int:
+        """Create the document record, already marked as processing."""
+        # Inserting with the processing status saves a separate status update
+        document = self._create_document_from_file(file_path, file_stat, filename)
+        document.processing_status = ProcessingStatus.PROCESSING
+        document_id = self.document_repo.create(document)
+        
+        self.log_repo.create_log(document_id, "processing", "Started document processing")
+        return document_id
+    
+    def _extract_text(self, file_path: str) -> str:
+        """Extract text using Azure Form Recognizer."""
+        extracted_text = self.azure_service.extract_text_from_document(file_path)
+        return self._check_extracted_text(extracted_text)
+    
+    def _check_extracted_text(self, extracted_text: Optional[str]) -> str:
+        """Fail if nothing was extracted.
         
-        for file_path in supported_files:
+        The text is written together with the final status in _finalize_document.
+        """
+        if not extracted_text or extracted_text.strip() == "":
+            raise Exception("No text extracted from document")
+        return extracted_text
+    
+    def _finalize_document(self, document_id: int, extracted_text: str,
+                           patient_data: PatientData, start_time: float,
+                           confidence_score: Optional[float] = None) -> ProcessingResult:
+        """Save extracted patient data and record the final document status.
+        
+        Batch callers pass a precomputed confidence_score; otherwise it is calculated here.
+        """
+        # Determine final status
+        processing_time = time.time() - start_time
+        if confidence_score is None:
+            confidence_score = self._calculate_overall_confidence(patient_data)
+        
+        if patient_data.has_low_confidence_fields():
+            final_status = ProcessingStatus.NEEDS_REVIEW
+            message = "Document processed but needs human review for low-confidence fields"
+        else:
+            final_status = ProcessingStatus.COMPLETED
+            message = "Document processed successfully"
+        
+        # Save patient data and the final status in one transaction
+        self.document_repo.save_results(document_id, final_status, extracted_text, patient_data)
+        self.log_repo.create_log(
+            document_id, 
+            final_status.value, 
+            message, 
+            processing_time, 
+            confidence_score
+        )
+        
+        return ProcessingResult(
+            document_id=document_id,
+            success=True,
+            extracted_data=patient_data,
+            processing_time=processing_time,
+            confidence_score=confidence_score
+        )
+    
+    def _fail_document(self, document_id: Optional[int], error: Exception,
+                       start_time: float) -> ProcessingResult:
+        """Mark a document as failed and build the failed ProcessingResult."""
+        processing_time = time.time() - start_time
+        error_message = f"Error processing document: {str(error)}"
+        logger.error(error_message)
+        
+        if document_id:
             try:
-                result = self.process_document(str(file_path))
-                results.append(result)
-                logger.info(f"Processed {file_path.name}: {result.success}")
+                self.document_repo.update_status(
+                    document_id, 
+                    ProcessingStatus.FAILED, 
+                    errors=[error_message]
+                )
+                self.log_repo.create_log(document_id, "failed", error_message, processing_time)
             except Exception as e:
-                logger.error(f"Failed to process {file_path.name}: {e}")
-                results.append(ProcessingResult(
-                    document_id=0,
-                    success=False,
-                    errors=[str(e)]
-                ))
+                logger.error(f"Failed to record failure for document {document_id}: {e}")
         
-        return results
+        return ProcessingResult(
+            document_id=document_id or 0,
+            success=False,
+            errors=[error_message],
+            processing_time=processing_time
+        )
     
     def get_documents_needing_review(self) -> List[Document]:
         """Get all documents that need human review."""
@@ -301,42 +642,26 @@ class DocumentProcessingService:
             logger.error(f"Error updating patient data: {e}")
             return False
     
-    def _create_document_from_file(self, file_path: str) -> Document:
-        """Create Document object from file."""
-        path = Path(file_path)
-        stat = path.stat()
+    def _create_document_from_file(self, file_path: str,
+                                   file_stat: Optional[os.stat_result] = None,
+                                   filename: Optional[str] = None) -> Document:
+        """Create Document object from file, reusing file_stat when the caller already has it."""
+        if file_stat is None:
+            file_stat = os.stat(file_path)
         
         return Document(
-            filename=path.name,
-            file_path=str(path.absolute()),
-            file_size=stat.st_size,
-            mime_type=self._get_mime_type(path.suffix),
+            filename=filename or os.path.basename(file_path),
+            file_path=os.path.abspath(file_path),
+            file_size=file_stat.st_size,
+            mime_type=self._get_mime_type(os.path.splitext(file_path)[1]),
             processing_status=ProcessingStatus.PENDING
         )
     
     def _get_mime_type(self, extension: str) -> str:
         """Get MIME type from file extension."""
-        mime_types = {
-            '.pdf': 'application/pdf',
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.tiff': 'image/tiff'
-        }
-        return mime_types.get(extension.lower(), 'application/octet-stream')
+        return _MIME_TYPES.get(extension.lower(), 'application/octet-stream')
     
     def _calculate_overall_confidence(self, patient_data: PatientData) -> float:
         """Calculate overall confidence score for patient data."""
-        fields = [
-            patient_data.name.confidence,
-            patient_data.date_of_birth.confidence,
-            patient_data.insurance_id.confidence,
-            patient_data.address.confidence,
-            patient_data.phone.confidence,
-            patient_data.email.confidence
-        ]
-        
-        # Calculate average confidence, excluding zero values
-        valid_confidences = [c for c in fields if c > 0]
-        return sum(valid_confidences) / len(valid_confidences) if valid_confidences else 0.0
+        return patient_data.overall_confidence()
 
@@ -3,15 +3,69 @@ Utility functions and helpers for MedDocReader application.
 Common functions used across the application.
 """
 
-import re
 import os
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from pathlib import Path
 import logging
 
+# RE2 matches in linear time, which matters for untrusted OCR text; the stdlib is the fallback.
+# The engines are not interchangeable as-is: RE2's \s, \w, \d and \b are ASCII-only (its \s
+# also leaves out \v), and its $ does not match before a trailing newline. So that production
+# (RE2) and dev/tests (stdlib) extract the same fields:
+# - compile_pattern() compiles stdlib patterns in ASCII mode,
+# - text is passed through TextUtils.normalize_spaces() so no-break and other Unicode spaces,
+#   common in OCR output, become plain spaces,
+# - anchored checks use fullmatch() rather than ^...$,
+# - patterns that must accept non-ASCII letters spell them out (_WORD_CHARS).
+try:
+    import re2 as re
+    _PATTERN_FLAGS = 0
+except ImportError:
+    import re
+    _PATTERN_FLAGS = re.ASCII
+
 logger = logging.getLogger(__name__)
 
 
+def compile_pattern(pattern: str):
+    """Compile a pattern so it matches the same text under RE2 and the stdlib."""
+    return re.compile(pattern, _PATTERN_FLAGS)
+
+
+# Whitespace outside RE2's \s ([\t\n\f\r ]) mapped to a plain space
+_SPACE_TRANSLATION = {
+    codepoint: ' '
+    for codepoint in range(0x3001)
+    if chr(codepoint).isspace() and chr(codepoint) not in '\t\n\f\r '
+}
+# \w as the stdlib matches it for Latin text: ASCII word characters plus Latin-1 letters,
+# so words such as "März" match under both engines
+_WORD_CHARS = '0-9_A-Za-z\u00c0-\u00d6\u00d8-\u00f6\u00f8-\u00ff'
+
+# Patterns compiled once at import time
+_UNSAFE_FILENAME_CHARS_RE = compile_pattern(r'[<>:"/\\|?*]')
+_REPEATED_UNDERSCORES_RE = compile_pattern(r'_+')
+_WHITESPACE_RE = compile_pattern(r'\s+')
+_NUMBER_RE = compile_pattern(r'\d+')
+_EMAIL_SEARCH_RE = compile_pattern(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
+# Optional country code prefix; also covers the bare and parenthesized forms
+_PHONE_RE = compile_pattern(r'\+?1?[-.\s]?\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})')
+_DATE_SEARCH_PATTERNS = [
+    compile_pattern(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'),
+    compile_pattern(r'\d{4}[/-]\d{1,2}[/-]\d{1,2}'),
+    compile_pattern(r'\d{1,2}\s+[' + _WORD_CHARS + r']+\s+\d{4}'),
+    compile_pattern(r'[' + _WORD_CHARS + r']+\s+\d{1,2},?\s+\d{4}'),
+]
+_EMAIL_VALID_RE = compile_pattern(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}')
+_NON_DIGIT_RE = compile_pattern(r'\D')
+_DATE_VALID_PATTERNS = [
+    compile_pattern(r'\d{1,2}/\d{1,2}/\d{2,4}'),
+    compile_pattern(r'\d{4}-\d{1,2}-\d{1,2}'),
+    compile_pattern(r'\d{1,2}-\d{1,2}-\d{2,4}'),
+]
+_INSURANCE_ID_RE = compile_pattern(r'[A-Za-z0-9\-]+')
+
+
 class FileUtils:
     """Utility functions for file operations."""
     
@@ -25,9 +79,12 @@ class FileUtils:
             return 0
     
     @staticmethod
-    def is_supported_format(file_path: str, supported_formats: tuple) -> bool:
-        """Check if file format is supported."""
-        extension = Path(file_path).suffix.lower()
+    def is_supported_format(file_path: str, supported_formats: Union[tuple, frozenset]) -> bool:
+        """Check if file format is supported.
+        
+        Pass a frozenset (such as config.supported_formats) for constant-time lookups.
+        """
+        extension = os.path.splitext(file_path)[1].lower()
         return extension in supported_formats
     
     @staticmethod
@@ -44,15 +101,20 @@ class FileUtils:
     def get_safe_filename(filename: str) -> str:
         """Get a safe filename by removing/replacing invalid characters."""
         # Remove or replace invalid characters
-        safe_name = re.sub(r'[<>:"/\\|?*]', '_', filename)
+        safe_name = _UNSAFE_FILENAME_CHARS_RE.sub('_', filename)
         # Remove multiple underscores
-        safe_name = re.sub(r'_+', '_', safe_name)
+        safe_name = _REPEATED_UNDERSCORES_RE.sub('_', safe_name)
         return safe_name.strip('_')
 
 
 class TextUtils:
     """Utility functions for text processing."""
     
+    @staticmethod
+    def normalize_spaces(text: str) -> str:
+        """Replace Unicode spaces (e.g. no-break spaces) with ' ' so RE2's \\s matches them."""
+        return text.translate(_SPACE_TRANSLATION)
+    
     @staticmethod
     def clean_text(text: str) -> str:
         """Clean and normalize text."""
@@ -60,7 +122,7 @@ class TextUtils:
             return ""
         
         # Remove extra whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = _WHITESPACE_RE.sub(' ', TextUtils.normalize_spaces(text))
         # Remove leading/trailing whitespace
         text = text.strip()
         return text
@@ -68,48 +130,33 @@ class TextUtils:
     @staticmethod
     def extract_numbers(text: str) -> List[str]:
         """Extract all numbers from text."""
-        return re.findall(r'\d+', text)
+        return _NUMBER_RE.findall(TextUtils.normalize_spaces(text))
     
     @staticmethod
     def extract_emails(text: str) -> List[str]:
         """Extract email addresses from text."""
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        return re.findall(email_pattern, text, re.IGNORECASE)
+        return _EMAIL_SEARCH_RE.findall(TextUtils.normalize_spaces(text))
     
     @staticmethod
     def extract_phones(text: str) -> List[str]:
         """Extract phone numbers from text."""
-        phone_patterns = [
-            r'\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})',
-            r'(\d{3})[-.\s]?(\d{3})[-.\s]?(\d{4})',
-            r'\+?1?[-.\s]?\(?(\d{3})\)?[-.\s]?(\d{3})[-.\s]?(\d{4})'
-        ]
+        # Dict keys dedupe in one pass while keeping the order found
+        phones: Dict[str, None] = {}
+        for match in _PHONE_RE.findall(TextUtils.normalize_spaces(text)):
+            phones[f"({match[0]}) {match[1]}-{match[2]}"] = None
         
-        phones = []
-        for pattern in phone_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if len(match) == 3:
-                    phones.append(f"({match[0]}) {match[1]}-{match[2]}")
-        
-        return list(set(phones))  # Remove duplicates
+        return list(phones)
     
     @staticmethod
     def extract_dates(text: str) -> List[str]:
         """Extract date patterns from text."""
-        date_patterns = [
-            r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}',
-            r'\d{4}[/-]\d{1,2}[/-]\d{1,2}',
-            r'\d{1,2}\s+\w+\s+\d{4}',
-            r'\w+\s+\d{1,2},?\s+\d{4}'
-        ]
-        
-        dates = []
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            dates.extend(matches)
+        # Dict keys dedupe in one pass while keeping the order found
+        text = TextUtils.normalize_spaces(text)
+        dates: Dict[str, None] = {}
+        for pattern in _DATE_SEARCH_PATTERNS:
+            dates.update(dict.fromkeys(pattern.findall(text)))
         
-        return list(set(dates))  # Remove duplicates
+        return list(dates)
 
 
 class ValidationUtils:
@@ -121,8 +168,7 @@ class ValidationUtils:
         if not email:
             return False
         
-        email_pattern = r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}$'
-        return bool(re.match(email_pattern, email))
+        return bool(_EMAIL_VALID_RE.fullmatch(email))
     
     @staticmethod
     def is_valid_phone(phone: str) -> bool:
@@ -131,7 +177,7 @@ class ValidationUtils:
             return False
         
         # Remove all non-digit characters
-        digits = re.sub(r'\D', '', phone)
+        digits = _NON_DIGIT_RE.sub('', phone)
         return len(digits) == 10 or len(digits) == 11
     
     @staticmethod
@@ -141,14 +187,8 @@ class ValidationUtils:
             return False
         
         # Try to parse common date formats
-        date_patterns = [
-            r'^\d{1,2}/\d{1,2}/\d{2,4}$',
-            r'^\d{4}-\d{1,2}-\d{1,2}$',
-            r'^\d{1,2}-\d{1,2}-\d{2,4}$'
-        ]
-        
-        for pattern in date_patterns:
-            if re.match(pattern, date_str):
+        for pattern in _DATE_VALID_PATTERNS:
+            if pattern.fullmatch(date_str):
                 return True
         
         return False
@@ -160,8 +200,7 @@ class ValidationUtils:
             return False
         
         # Basic validation - alphanumeric with possible hyphens
-        pattern = r'^[A-Za-z0-9\-]+$'
-        return bool(re.match(pattern, insurance_id)) and len(insurance_id) >= 3
+        return bool(_INSURANCE_ID_RE.fullmatch(insurance_id)) and len(insurance_id) >= 3
 
 
 class ResponseUtils:
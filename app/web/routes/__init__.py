@@ -4,17 +4,31 @@ Provides FastAPI endpoints for document upload, review, and management.
 """
 
 from fastapi import FastAPI, Request, Form, File, UploadFile, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, ORJSONResponse, Response, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from typing import List, Optional
+from fastapi.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+import asyncio
+import hashlib
 import os
+import sys
+import uuid
 import logging
 
+import aiofiles
+from jinja2 import FileSystemBytecodeCache
+import orjson
+from cachetools import TTLCache
+
 from app.config import config
 from app.services import DocumentProcessingService
-from app.models import ProcessingStatus
-from app.database.repositories import DocumentRepository, PatientRepository
+from app.models import Document, ProcessingStatus, PatientData, ExtractedField, ProcessingResult
+from app.database import db_manager
+from app.database.repositories import DocumentRepository, log_buffer
 
 
 logger = logging.getLogger(__name__)
@@ -23,19 +37,163 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="MedDocReader",
     description="Medical Document Processing System",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serializes straight to bytes and handles datetimes natively
+    default_response_class=ORJSONResponse
 )
 
+
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles that lets browsers cache assets instead of re-requesting them on every page.
+    
+    Starlette already sends ETag and Last-Modified, so after max-age expires the
+    browser revalidates with a cheap conditional request.
+    """
+    
+    cache_control = f"public, max-age={config.static_max_age}"
+    
+    def file_response(self, *args, **kwargs) -> Response:
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
+
+
 # Mount static files
-app.mount("/static", StaticFiles(directory="app/web/static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="app/web/static"), name="static")
+
+
+class SelectiveGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that passes requests for ``exclude_paths`` through uncompressed.
+    
+    gzip buffers a streamed body until enough output accumulates, which would hold back
+    results that are meant to reach the client as soon as they are produced.
+    """
+    
+    def __init__(self, app, exclude_paths: frozenset = frozenset(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = exclude_paths
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Streamed responses whose chunks must not be held back by compression
+UNCOMPRESSED_PATHS = frozenset(("/api/process-batch",))
 
-# Set up templates
+# Compress HTML and JSON bodies for clients that accept gzip; tiny responses are sent as-is
+app.add_middleware(SelectiveGZipMiddleware, exclude_paths=UNCOMPRESSED_PATHS, minimum_size=1024, compresslevel=5)
+
+# Set up templates. Outside debug mode templates are compiled once and never re-checked on disk,
+# and the compiled bytecode is shared between workers through the filesystem cache.
+# The cache directory is created at startup.
 templates = Jinja2Templates(directory="app/web/templates")
+templates.env.auto_reload = config.debug
+templates.env.bytecode_cache = FileSystemBytecodeCache(config.template_cache_dir)
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1 << 20
+MAX_UPLOAD_BYTES = config.max_upload_mb * 1024 * 1024
+# File-to-file sendfile is Linux-only; elsewhere os.sendfile needs a socket destination
+SENDFILE_UPLOADS = sys.platform.startswith("linux")
+# Starlette spools multipart uploads in memory up to this size, then moves them to a temp file
+UPLOAD_SPOOL_MAX_SIZE = MultiPartParser.max_file_size
+
+# JSON API responses may be reused by the client briefly, then revalidated with If-None-Match
+API_CACHE_CONTROL = "private, max-age=5"
 
 # Initialize services
 processing_service = DocumentProcessingService()
 document_repo = DocumentRepository()
-patient_repo = PatientRepository()
+
+# Endpoints that only do blocking repository reads are plain ``def`` so Starlette runs them
+# on its threadpool. Async endpoints send short database calls and file copies there with
+# run_in_threadpool, and OCR/NLP processing to run_in_processing_pool.
+
+# Blocking OCR/NLP work runs here so it never stalls the event loop.
+# A dedicated pool keeps long jobs from starving Starlette's threadpool, and keeps quick
+# database reads from queueing behind them.
+processing_executor = ThreadPoolExecutor(
+    max_workers=config.processing_workers,
+    thread_name_prefix="processing"
+)
+
+
+async def run_in_processing_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a blocking call on the processing executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(processing_executor, func, *args)
+
+
+# Short-lived results for the listing queries behind the dashboard, review page and API.
+# Only touched from the event loop thread, so no lock is needed. Cleared whenever a
+# document finishes processing or is reviewed.
+view_cache = TTLCache(maxsize=16, ttl=config.view_cache_ttl)
+
+
+async def cached_view(key: str, func: Callable[..., Any], *args: Any) -> Any:
+    """Return the cached result for key, or run the database read func on the threadpool and cache it."""
+    try:
+        return view_cache[key]
+    except KeyError:
+        pass
+    value = await run_in_threadpool(func, *args)
+    view_cache[key] = value
+    return value
+
+
+def _sendfile_upload(src_fd: int, size: int, file_path: str) -> int:
+    """Copy an upload that is already on disk to file_path inside the kernel; returns bytes copied."""
+    dst_fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        offset = 0
+        while offset < size:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+        return offset
+    finally:
+        os.close(dst_fd)
+
+
+def _etag(data: bytes) -> str:
+    """Weak ETag for a response, derived from data that changes whenever its content does."""
+    return 'W/"' + hashlib.blake2b(data, digest_size=8).hexdigest() + '"'
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already holds the representation tagged etag."""
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": API_CACHE_CONTROL})
+    return None
+
+
+@app.on_event("startup")
+async def open_database_pool():
+    """Open the shared connection pool before serving so no request pays for connection setup."""
+    await run_in_threadpool(db_manager.connect)
+
+
+@app.on_event("startup")
+async def prepare_directories():
+    """Create the upload and template cache directories once instead of on every use."""
+    os.makedirs(config.upload_dir, exist_ok=True)
+    os.makedirs(config.template_cache_dir, exist_ok=True)
+
+
+@app.on_event("shutdown")
+async def close_database_pool():
+    """Stop the processing executor, then write buffered processing logs and close pooled connections.
+    
+    Jobs that have not started are cancelled and running ones are waited for, so none of
+    them queues logs after the final flush or reopens the pool after it is closed.
+    """
+    await run_in_threadpool(processing_executor.shutdown, wait=True, cancel_futures=True)
+    await run_in_threadpool(log_buffer.flush)
+    await run_in_threadpool(db_manager.disconnect)
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -43,18 +201,22 @@ async def dashboard(request: Request):
     """Main dashboard showing processing status and documents needing review."""
     try:
         # Get documents needing review
-        documents_needing_review = processing_service.get_documents_needing_review()
+        documents_needing_review = await cached_view(
+            "needing_review", processing_service.get_documents_needing_review
+        )
         
         # Get recent documents
-        recent_documents = document_repo.get_by_status(ProcessingStatus.COMPLETED)[:10]
+        recent_documents = await cached_view(
+            "recent_completed", document_repo.get_recent_by_status, ProcessingStatus.COMPLETED, 10
+        )
         
         return templates.TemplateResponse("dashboard.html", {
             "request": request,
             "documents_needing_review": documents_needing_review,
             "recent_documents": recent_documents
         })
-    except Exception as e:
-        logger.error(f"Error loading dashboard: {e}")
+    except Exception:
+        logger.exception("Error loading dashboard")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -76,20 +238,42 @@ async def upload_document(
         if file_ext not in config.supported_formats:
             raise HTTPException(
                 status_code=400, 
-                detail=f"Unsupported file type. Supported formats: {config.supported_formats}"
+                detail=f"Unsupported file type. Supported formats: {', '.join(sorted(config.supported_formats))}"
             )
         
-        # Save uploaded file
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        file_path = os.path.join(upload_dir, file.filename)
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File exceeds {config.max_upload_mb} MB limit")
         
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Save under a generated name; the client's filename is only kept for display,
+        # so it can neither escape the upload directory nor overwrite another upload
+        file_path = f"{config.upload_dir}/{uuid.uuid4().hex}{file_ext}"
+        
+        if SENDFILE_UPLOADS and file.size is not None and file.size > UPLOAD_SPOOL_MAX_SIZE:
+            # Large uploads are already spooled to a temp file; copy it without passing through Python
+            src_fd = file.file.fileno()
+            written = os.fstat(src_fd).st_size
+            if written <= MAX_UPLOAD_BYTES:
+                await run_in_threadpool(_sendfile_upload, src_fd, written, file_path)
+        else:
+            # Stream to disk so only one chunk is held in memory regardless of file size
+            written = 0
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    written += len(chunk)
+                    if written > MAX_UPLOAD_BYTES:
+                        break
+                    await buffer.write(chunk)
+        
+        if written > MAX_UPLOAD_BYTES:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise HTTPException(status_code=413, detail=f"File exceeds {config.max_upload_mb} MB limit")
         
         # Process document
-        result = processing_service.process_document(file_path)
+        result = await run_in_processing_pool(
+            processing_service.process_document, file_path, os.path.basename(file.filename)
+        )
+        view_cache.clear()
         
         if result.success:
             return RedirectResponse(url=f"/document/{result.document_id}", status_code=303)
@@ -98,21 +282,19 @@ async def upload_document(
             
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Error uploading document: {e}")
+    except Exception:
+        logger.exception("Error uploading document")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/document/{document_id}", response_class=HTMLResponse)
-async def view_document(request: Request, document_id: int):
+def view_document(request: Request, document_id: int):
     """View document details and extracted data."""
     try:
-        document = document_repo.get_by_id(document_id)
+        document, patient_data = document_repo.get_with_patient(document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        patient_data = patient_repo.get_by_document_id(document_id)
-        
         return templates.TemplateResponse("document_detail.html", {
             "request": request,
             "document": document,
@@ -120,8 +302,8 @@ async def view_document(request: Request, document_id: int):
         })
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Error viewing document: {e}")
+    except Exception:
+        logger.exception("Error viewing document")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -129,26 +311,24 @@ async def view_document(request: Request, document_id: int):
 async def review_page(request: Request):
     """Page showing all documents needing review."""
     try:
-        documents = processing_service.get_documents_needing_review()
+        documents = await cached_view("needing_review", processing_service.get_documents_needing_review)
         return templates.TemplateResponse("review.html", {
             "request": request,
             "documents": documents
         })
-    except Exception as e:
-        logger.error(f"Error loading review page: {e}")
+    except Exception:
+        logger.exception("Error loading review page")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @app.get("/review/{document_id}", response_class=HTMLResponse)
-async def review_document(request: Request, document_id: int):
+def review_document(request: Request, document_id: int):
     """Review and edit document data."""
     try:
-        document = document_repo.get_by_id(document_id)
+        document, patient_data = document_repo.get_with_patient(document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        patient_data = patient_repo.get_by_document_id(document_id)
-        
         return templates.TemplateResponse("review_edit.html", {
             "request": request,
             "document": document,
@@ -156,8 +336,8 @@ async def review_document(request: Request, document_id: int):
         })
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Error loading review page: {e}")
+    except Exception:
+        logger.exception("Error loading review page")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
@@ -173,19 +353,22 @@ async def update_reviewed_data(
 ):
     """Update reviewed patient data."""
     try:
-        from app.models import PatientData, ExtractedField
-        
-        # Create updated patient data with high confidence
-        updated_data = PatientData(
-            name=ExtractedField(value=name, confidence=1.0),
-            date_of_birth=ExtractedField(value=date_of_birth, confidence=1.0),
-            insurance_id=ExtractedField(value=insurance_id, confidence=1.0),
-            address=ExtractedField(value=address, confidence=1.0),
-            phone=ExtractedField(value=phone, confidence=1.0),
-            email=ExtractedField(value=email, confidence=1.0)
-        )
+        # Reviewed values are trusted, so every field gets full confidence
+        reviewed = {
+            "name": name,
+            "date_of_birth": date_of_birth,
+            "insurance_id": insurance_id,
+            "address": address,
+            "phone": phone,
+            "email": email
+        }
+        updated_data = PatientData(**{
+            field_name: ExtractedField(value=value, confidence=1.0)
+            for field_name, value in reviewed.items()
+        })
         
-        success = processing_service.update_patient_data(document_id, updated_data)
+        success = await run_in_threadpool(processing_service.update_patient_data, document_id, updated_data)
+        view_cache.clear()
         
         if success:
             return RedirectResponse(url="/", status_code=303)
@@ -194,33 +377,43 @@ async def update_reviewed_data(
             
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Error updating reviewed data: {e}")
+    except Exception:
+        logger.exception("Error updating reviewed data")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@app.get("/api/documents", response_class=JSONResponse)
-async def api_get_documents():
+@app.get("/api/documents")
+async def api_get_documents(request: Request, response: Response):
     """API endpoint to get all documents."""
     try:
-        documents = document_repo.get_by_status(ProcessingStatus.COMPLETED)
-        return {"documents": [{"id": d.id, "filename": d.filename, "upload_date": d.upload_date} for d in documents]}
-    except Exception as e:
-        logger.error(f"Error getting documents: {e}")
+        # A cheap aggregate identifies the current list without fetching it
+        version = await run_in_threadpool(document_repo.get_status_version, ProcessingStatus.COMPLETED)
+        etag = _etag(orjson.dumps(version))
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = API_CACHE_CONTROL
+        # Keying on the ETag means a cached list is never served under a newer tag
+        documents = await cached_view(
+            f"completed_summaries:{etag}", document_repo.get_summaries_by_status, ProcessingStatus.COMPLETED
+        )
+        return {"documents": documents}
+    except Exception:
+        logger.exception("Error getting documents")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
-@app.get("/api/documents/{document_id}", response_class=JSONResponse)
-async def api_get_document(document_id: int):
+@app.get("/api/documents/{document_id}")
+def api_get_document(request: Request, response: Response, document_id: int):
     """API endpoint to get specific document data."""
     try:
-        document = document_repo.get_by_id(document_id)
+        document, patient_data = document_repo.get_with_patient(document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        patient_data = patient_repo.get_by_document_id(document_id)
-        
-        return {
+        payload = {
             "document": {
                 "id": document.id,
                 "filename": document.filename,
@@ -233,30 +426,112 @@ async def api_get_document(document_id: int):
                 "insurance_id": patient_data.insurance_id.value if patient_data else None
             } if patient_data else None
         }
+        
+        etag = _etag(orjson.dumps(payload))
+        not_modified = _not_modified(request, etag)
+        if not_modified:
+            return not_modified
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = API_CACHE_CONTROL
+        return payload
     except HTTPException:
         raise
-    except Exception as e:
-        logger.error(f"Error getting document: {e}")
+    except Exception:
+        logger.exception("Error getting document")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def _export_lines(documents: Iterator[Document]) -> Iterator[bytes]:
+    """Serialize streamed documents as newline-delimited JSON, one line per document.
+    
+    Starlette steps this generator on the default threadpool, so the database
+    connection behind the stream stays checked out until the download ends.
+    """
+    for document in documents:
+        yield orjson.dumps({
+            "id": document.id,
+            "filename": document.filename,
+            "file_path": document.file_path,
+            "file_size": document.file_size,
+            "mime_type": document.mime_type,
+            "upload_date": document.upload_date,
+            "status": document.processing_status.value,
+            "extracted_text": document.extracted_text,
+            "processing_errors": document.processing_errors,
+            "metadata": document.metadata,
+        }, option=orjson.OPT_APPEND_NEWLINE)
+
+
+@app.get("/api/export/documents")
+def api_export_documents(status: ProcessingStatus = ProcessingStatus.COMPLETED):
+    """API endpoint to download every document with a status as NDJSON."""
+    return StreamingResponse(
+        _export_lines(document_repo.iter_by_status(status)), media_type="application/x-ndjson"
+    )
+
+
+@app.get("/api/export/review")
+def api_export_review():
+    """API endpoint to download every document needing review as NDJSON."""
+    return StreamingResponse(
+        _export_lines(document_repo.iter_needing_review()), media_type="application/x-ndjson"
+    )
+
+
+async def _stream_batch_results(files: list) -> AsyncIterator[bytes]:
+    """Yield the batch response JSON piece by piece as each document result arrives.
+    
+    The counts come after the results, since they are only known once the batch is done.
+    The status line has already been sent, so an unexpected error is reported as a
+    failed result record and the JSON document is still closed.
+    """
+    results = processing_service.iter_batch(files)
+    processed_count = 0
+    successful_count = 0
+    
+    yield b'{"success":true,"results":['
+    while True:
+        try:
+            # Each step blocks on Azure/NLP work, so it runs on the processing pool
+            result = await run_in_processing_pool(next, results, None)
+        except Exception:
+            # The batch generator is finished once it raises, so report this as its last result
+            logger.exception("Error processing batch")
+            result = ProcessingResult(document_id=0, success=False, errors=["Internal server error"])
+            results = iter(())
+        if result is None:
+            break
+        if processed_count:
+            yield b","
+        yield orjson.dumps({"success": result.success, "errors": result.errors})
+        processed_count += 1
+        successful_count += result.success
+    
+    view_cache.clear()
+    yield b'],"processed_count":' + str(processed_count).encode() + b',"successful_count":' + str(successful_count).encode() + b"}"
+
+
 @app.post("/api/process-batch")
 async def api_process_batch(folder_path: str = Form(...)):
     """API endpoint to process a batch of documents."""
     try:
-        results = processing_service.process_batch(folder_path)
-        return {
-            "success": True,
-            "processed_count": len(results),
-            "successful_count": sum(1 for r in results if r.success),
-            "results": [{"success": r.success, "errors": r.errors} for r in results]
-        }
-    except Exception as e:
-        logger.error(f"Error processing batch: {e}")
+        files = await run_in_processing_pool(processing_service.list_batch_files, folder_path)
+    except Exception:
+        logger.exception("Error processing batch")
         raise HTTPException(status_code=500, detail="Internal server error")
+    
+    return StreamingResponse(_stream_batch_results(files), media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host=config.host, port=config.port)
+    uvicorn.run(
+        "app.web.routes:app",
+        host=config.host,
+        port=config.port,
+        workers=config.workers,
+        loop="auto",
+        http="auto"
+    )
 
@@ -0,0 +1,38 @@
+"""
+Shared pytest fixtures for the MedDocReader test suite.
+
+Tests that need PostgreSQL run against the database in ``TEST_DATABASE_URL``
+and are skipped when it is not set or not reachable.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Make the ``app`` package importable when pytest is run from any directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def database():
+    """A DatabaseManager connected to ``TEST_DATABASE_URL`` with an initialized, empty schema."""
+    psycopg2 = pytest.importorskip("psycopg2")
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    try:
+        psycopg2.connect(url).close()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Test database is not reachable: {e}")
+    
+    from app.database import db_manager, init_database, SCHEMA_TABLES
+    
+    db_manager.disconnect()
+    db_manager.connection_string = url
+    init_database()
+    yield db_manager
+    
+    with db_manager.get_cursor() as cursor:
+        cursor.execute(f"TRUNCATE {', '.join(SCHEMA_TABLES)} RESTART IDENTITY CASCADE")
+    db_manager.disconnect()
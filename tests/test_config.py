@@ -0,0 +1,33 @@
+"""Tests for parsing the configuration from the environment."""
+
+from app.config import DatabaseConfig, NLPConfig, get_db_config, get_nlp_config
+
+
+def test_factories_parse_the_environment_when_called(monkeypatch):
+    monkeypatch.setenv("DB_PORT", "6543")
+    monkeypatch.setenv("NLP_RULE_BASED_NER", "TRUE")
+    get_db_config.cache_clear()
+    get_nlp_config.cache_clear()
+    try:
+        db_config = get_db_config()
+        nlp_config = get_nlp_config()
+    finally:
+        get_db_config.cache_clear()
+        get_nlp_config.cache_clear()
+    
+    assert db_config.port == 6543
+    assert db_config.connection_string.endswith(":6543/healthcare_db")
+    assert nlp_config.use_rule_based_ner is True
+
+
+def test_unset_variables_keep_the_field_defaults(monkeypatch):
+    monkeypatch.delenv("DB_POOL_SIZE", raising=False)
+    monkeypatch.delenv("SPACY_MODEL", raising=False)
+    get_db_config.cache_clear()
+    get_nlp_config.cache_clear()
+    try:
+        assert get_db_config().pool_size == DatabaseConfig().pool_size
+        assert get_nlp_config().model_name == NLPConfig().model_name
+    finally:
+        get_db_config.cache_clear()
+        get_nlp_config.cache_clear()
@@ -0,0 +1,328 @@
+"""Tests for DatabaseManager and the repositories against a live PostgreSQL database."""
+
+import atexit
+import dataclasses
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import app.database
+import app.database.repositories
+from app.config import config
+from app.database import DatabaseManager, SECONDARY_INDEXES
+from app.database.repositories import (
+    DocumentRepository, PatientRepository, ProcessingLogBuffer, ProcessingLogRepository,
+    PREPARED_QUERIES, PROCESSING_LOG_COLUMNS
+)
+from app.models import Document, ExtractedField, PatientData, ProcessingStatus
+
+
+def _documents(count, status=ProcessingStatus.COMPLETED):
+    return [
+        Document(filename=f"doc_{i}.pdf", file_path=f"/data/doc_{i}.pdf", file_size=i,
+                 mime_type="application/pdf", processing_status=status)
+        for i in range(count)
+    ]
+
+
+def test_documents_without_errors_each_get_an_appendable_list():
+    row = (1, "a.pdf", "/data/a.pdf", 1, "application/pdf", None, "completed", None, None, None)
+    first = DocumentRepository._row_to_document(row)
+    second = DocumentRepository._row_to_document(row)
+    
+    first.processing_errors.append("OCR failed")
+    
+    assert second.processing_errors == []
+
+
+def test_execute_query_stream_yields_more_rows_than_itersize(database):
+    rows = database.execute_query_stream("SELECT generate_series(1, 25)", batch_size=10)
+    
+    assert [row[0] for row in rows] == list(range(1, 26))
+
+
+def test_execute_query_stream_raises_the_query_error(database):
+    with pytest.raises(psycopg2.errors.DivisionByZero):
+        list(database.execute_query_stream("SELECT 1 / 0"))
+    
+    assert database.execute_query("SELECT 1") == [(1,)]
+
+
+def test_iter_by_status_streams_every_document(database):
+    repo = DocumentRepository()
+    for document in _documents(5, ProcessingStatus.NEEDS_REVIEW):
+        repo.create(document)
+    
+    streamed = list(repo.iter_by_status(ProcessingStatus.NEEDS_REVIEW))
+    reviewed = list(repo.iter_needing_review())
+    
+    assert sorted(d.filename for d in streamed) == [f"doc_{i}.pdf" for i in range(5)]
+    assert len(reviewed) == 5
+
+
+def test_status_version_reads_the_latest_update_from_the_index(database):
+    repo = DocumentRepository()
+    assert repo.get_status_version(ProcessingStatus.COMPLETED)[0] is None
+    repo.create(_documents(1)[0])
+    
+    with database.get_cursor() as cursor:
+        # The table is tiny, so keep the planner from preferring a sequential scan anyway
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("EXPLAIN " + PREPARED_QUERIES['doc_status_version'].replace("$1", "'completed'"))
+        plan = cursor.fetchall()
+    
+    assert repo.get_status_version(ProcessingStatus.COMPLETED)[0] is not None
+    assert "idx_documents_status_updated_at" in "\n".join(row[0] for row in plan)
+
+
+def test_status_version_changes_when_a_document_leaves_the_status_or_is_deleted(database):
+    repo = DocumentRepository()
+    first_id, second_id = repo.bulk_create(_documents(2))
+    initial = repo.get_status_version(ProcessingStatus.COMPLETED)
+    
+    repo.update_status(first_id, ProcessingStatus.FAILED)
+    after_leaving = repo.get_status_version(ProcessingStatus.COMPLETED)
+    repo.delete(second_id)
+    after_delete = repo.get_status_version(ProcessingStatus.COMPLETED)
+    
+    assert initial[1] == 2
+    assert after_leaving[1] == 1 and after_leaving != initial
+    assert after_delete == (None, 0)
+
+
+def test_documents_read_back_with_their_patient_data(database):
+    repo = DocumentRepository()
+    document_id = repo.create(_documents(1)[0])
+    patient_data = PatientData(name=ExtractedField("John Smith", 0.9), date_of_birth=ExtractedField("01/02/1980", 0.6))
+    repo.save_results(document_id, ProcessingStatus.NEEDS_REVIEW, "scanned text", patient_data)
+    
+    document, loaded = repo.get_with_patient(document_id)
+    
+    assert document.processing_status == ProcessingStatus.NEEDS_REVIEW
+    assert loaded.name == patient_data.name
+    assert loaded.date_of_birth.value == date(1980, 1, 2)
+    assert loaded.date_of_birth.needs_review
+    assert PatientRepository().get_by_document_id(document_id) == loaded
+
+
+def test_cursors_wait_for_a_free_connection_when_the_pool_is_exhausted(database, monkeypatch):
+    small_pool = dataclasses.replace(app.database.db_config, pool_size=2, pool_min_size=1)
+    monkeypatch.setattr(app.database, "db_config", small_pool)
+    manager = DatabaseManager()
+    manager.connection_string = database.connection_string
+    
+    def sleep_and_select(value):
+        with manager.get_cursor() as cursor:
+            cursor.execute("SELECT pg_sleep(0.05), %s", (value,))
+            return cursor.fetchone()[1]
+    
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(sleep_and_select, range(16)))
+    finally:
+        manager.disconnect()
+    
+    assert results == list(range(16))
+
+
+def test_checkout_gives_up_when_no_connection_frees_up_in_time(database, monkeypatch):
+    small_pool = dataclasses.replace(app.database.db_config, pool_size=1, pool_min_size=1, pool_timeout=0.1)
+    monkeypatch.setattr(app.database, "db_config", small_pool)
+    manager = DatabaseManager()
+    manager.connection_string = database.connection_string
+    
+    try:
+        with manager.get_cursor():
+            with pytest.raises(psycopg2.pool.PoolError, match="within 0.1s"):
+                with manager.get_cursor():
+                    pass
+        # The slot is released again once the first cursor is done
+        with manager.get_cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        manager.disconnect()
+
+
+def _existing_indexes(database):
+    rows = database.execute_query(
+        "SELECT relation FROM unnest(%s::text[]) AS relation WHERE to_regclass(relation) IS NOT NULL",
+        (list(SECONDARY_INDEXES),)
+    )
+    return {row[0] for row in rows}
+
+
+def _synchronous_commit(database):
+    return database.execute_query("SELECT current_setting('synchronous_commit')")[0][0]
+
+
+def test_bulk_load_mode_drops_and_rebuilds_secondary_indexes(database):
+    with database.bulk_load_mode():
+        assert _existing_indexes(database) == set()
+    
+    assert _existing_indexes(database) == set(SECONDARY_INDEXES)
+
+
+def test_init_database_leaves_indexes_to_a_running_bulk_load(database):
+    with database.bulk_load_mode():
+        app.database.init_database()
+        assert _existing_indexes(database) == set()
+    
+    assert _existing_indexes(database) == set(SECONDARY_INDEXES)
+
+
+def test_bulk_load_mode_only_changes_the_calling_thread(database):
+    with database.bulk_load_mode():
+        with ThreadPoolExecutor(1) as executor:
+            other_thread = executor.submit(_synchronous_commit, database).result()
+        with ThreadPoolExecutor(1, initializer=database.join_bulk_load) as executor:
+            joined_thread = executor.submit(_synchronous_commit, database).result()
+        
+        assert _synchronous_commit(database) == "off"
+        assert other_thread == "on"
+        assert joined_thread == "off"
+    
+    assert _synchronous_commit(database) == "on"
+
+
+def test_overlapping_bulk_loads_rebuild_indexes_when_the_last_one_ends(database):
+    entered = threading.Event()
+    release = threading.Event()
+    
+    def first_load():
+        with database.bulk_load_mode():
+            entered.set()
+            release.wait(10)
+    
+    with ThreadPoolExecutor(1) as executor:
+        first = executor.submit(first_load)
+        assert entered.wait(10)
+        with database.bulk_load_mode():
+            release.set()
+            first.result()
+            assert _existing_indexes(database) == set()
+    
+    assert _existing_indexes(database) == set(SECONDARY_INDEXES)
+
+
+def test_bulk_load_mode_gives_up_when_the_ddl_lock_stays_taken(database, monkeypatch):
+    monkeypatch.setattr(app.database, "db_config", dataclasses.replace(app.database.db_config, bulk_lock_timeout=0.2))
+    
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(hashtext(%s))", (app.database.BULK_LOAD_DDL_LOCK,))
+        try:
+            with pytest.raises(TimeoutError):
+                with database.bulk_load_mode():
+                    pass
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (app.database.BULK_LOAD_DDL_LOCK,))
+    
+    assert _existing_indexes(database) == set(SECONDARY_INDEXES)
+
+
+def test_copy_insert_keeps_empty_strings_distinct_from_null(database):
+    document_id = DocumentRepository().create(_documents(1)[0])
+    rows = [
+        (document_id, "processing", None, 0.5, 0.9),
+        (document_id, "processing", "", 0.5, 0.9),
+        (document_id, "processing", "\\N", 0.5, 0.9),
+        (document_id, "failed", 'tab\there, "quoted"\nand a new line', None, None),
+    ]
+    
+    ids = database.copy_insert("processing_logs", PROCESSING_LOG_COLUMNS, rows)
+    stored = database.execute_query(
+        "SELECT document_id, status, message, processing_time, confidence_score "
+        "FROM processing_logs WHERE id = ANY(%s) ORDER BY id",
+        (ids,)
+    )
+    
+    assert stored == rows
+
+
+def test_bulk_create_round_trips_arrays_and_json_through_copy(database, monkeypatch):
+    monkeypatch.setattr(
+        app.database.repositories, "db_config",
+        dataclasses.replace(app.database.repositories.db_config, copy_threshold=1)
+    )
+    repo = DocumentRepository()
+    documents = _documents(3)
+    documents[0].processing_errors = ['first "error"', "", "back\\slash"]
+    documents[1].metadata = {"pages": 2, "source": "", "tags": ["a", "b"]}
+    documents[2].extracted_text = ""
+    
+    ids = repo.bulk_create(documents)
+    stored = [repo.get_by_id(document_id) for document_id in ids]
+    
+    assert [d.filename for d in stored] == ["doc_0.pdf", "doc_1.pdf", "doc_2.pdf"]
+    assert stored[0].processing_errors == ['first "error"', "", "back\\slash"]
+    assert stored[1].metadata == {"pages": 2, "source": "", "tags": ["a", "b"]}
+    assert stored[2].extracted_text == ""
+
+
+def test_a_full_processing_chunk_is_copied_and_ids_follow_row_order(database, monkeypatch):
+    copy_insert = mock.Mock(wraps=database.copy_insert)
+    monkeypatch.setattr(database, "copy_insert", copy_insert)
+    repo = DocumentRepository()
+    
+    ids = repo.bulk_create(_documents(config.batch_size))
+    
+    copy_insert.assert_called_once()
+    assert [repo.get_by_id(document_id).filename for document_id in ids] == [
+        f"doc_{i}.pdf" for i in range(config.batch_size)
+    ]
+
+
+def test_log_buffer_retries_rows_one_by_one_when_the_batch_fails(database):
+    document_id = DocumentRepository().create(_documents(1)[0])
+    buffer = ProcessingLogBuffer(flush_interval=60, flush_size=1000)
+    buffer.append((document_id, "processing", "started", 0.0, 0.0))
+    # Violates the documents foreign key, which fails the batched insert
+    buffer.append((document_id + 1000, "processing", "orphan", 0.0, 0.0))
+    buffer.append((document_id, "completed", "done", 1.5, 0.9))
+    
+    buffer.flush()
+    
+    stored = database.execute_query("SELECT message FROM processing_logs ORDER BY id")
+    assert [row[0] for row in stored] == ["started", "done"]
+
+
+def test_buffered_logs_are_stamped_by_the_database_in_queue_order(database):
+    document_id = DocumentRepository().create(_documents(1)[0])
+    repo = ProcessingLogRepository()
+    repo.create_log(document_id, "processing", "started")
+    repo.create_log(document_id, "completed", "done")
+    
+    logs = repo.get_logs_by_document(document_id)
+    now = database.execute_query("SELECT CURRENT_TIMESTAMP::timestamp")[0][0]
+    
+    assert [log["message"] for log in logs] == ["done", "started"]
+    assert abs(now - logs[0]["created_at"]) < timedelta(minutes=1)
+
+
+def test_log_buffer_close_stops_the_flush_thread_and_writes_queued_rows(database):
+    document_id = DocumentRepository().create(_documents(1)[0])
+    buffer = ProcessingLogBuffer(flush_interval=60, flush_size=1000)
+    buffer.append((document_id, "completed", "done", 1.5, 0.9))
+    thread = buffer._thread
+    
+    buffer.close()
+    
+    assert not thread.is_alive()
+    stored = database.execute_query("SELECT message FROM processing_logs")
+    assert [row[0] for row in stored] == ["done"]
+
+
+def test_log_buffer_close_does_not_reopen_a_closed_pool(database, caplog):
+    buffer = ProcessingLogBuffer(flush_interval=60, flush_size=1000)
+    buffer.append((1, "completed", "done", 1.5, 0.9))
+    database.disconnect()
+    
+    buffer.close()
+    atexit.unregister(buffer.close)
+    
+    assert not database.is_connected
+    assert "Dropped 1 processing log entries" in caplog.text
@@ -0,0 +1,39 @@
+"""Tests for the data models."""
+
+import random
+
+from app.models import ExtractedField, PatientData, ProcessingResult
+
+
+def _patient_data(*confidences):
+    names = ("name", "date_of_birth", "insurance_id", "address", "phone", "email")
+    return PatientData(**{
+        name: ExtractedField(value="x" if confidence else None, confidence=confidence)
+        for name, confidence in zip(names, confidences)
+    })
+
+
+def test_mean_confidence_keeps_stored_values_exact():
+    scores = PatientData.mean_confidence([_patient_data(0.74), _patient_data(0.9, 0.8, 0.0, 0.7)]).tolist()
+    
+    assert scores == [0.74, (0.9 + 0.8 + 0.7) / 3]
+
+
+def test_mean_confidence_matches_overall_confidence():
+    rng = random.Random(7)
+    records = [
+        _patient_data(*(rng.choice([0.0, rng.random()]) for _ in range(6)))
+        for _ in range(200)
+    ]
+    
+    scores = ProcessingResult.mean_confidence(
+        [ProcessingResult(document_id=i, success=True, extracted_data=record) for i, record in enumerate(records)]
+    ).tolist()
+    
+    assert scores == [record.overall_confidence() for record in records]
+
+
+def test_overall_confidence_ignores_fields_that_were_not_extracted():
+    assert _patient_data(0.0, 0.6, 0.0, 0.8).overall_confidence() == (0.6 + 0.8) / 2
+    assert PatientData().overall_confidence() == 0.0
+    assert ProcessingResult(document_id=1, success=False).overall_confidence == 0.0
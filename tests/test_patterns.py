@@ -0,0 +1,86 @@
+"""Tests for the module-level regex patterns under RE2 and the stdlib fallback."""
+
+import re as stdlib_re
+
+import pytest
+
+
+def test_utils_patterns_compile_with_re2():
+    re2 = pytest.importorskip("re2")
+    import app.utils as module
+    
+    assert module.re is re2
+    assert module.TextUtils.extract_emails("Contact: Jane.Doe@Example.ORG") == ["Jane.Doe@Example.ORG"]
+
+
+def test_services_patterns_compile_with_re2():
+    re2 = pytest.importorskip("re2")
+    pytest.importorskip("spacy")
+    pytest.importorskip("azure.ai.formrecognizer")
+    import app.services as module
+    
+    assert isinstance(module._INSURANCE_RE, type(re2.compile("")))
+    assert module._INSURANCE_RE.search("POLICY# ab-1234").group(1) == "ab-1234"
+
+
+def test_insurance_pattern_is_case_insensitive():
+    pytest.importorskip("spacy")
+    pytest.importorskip("azure.ai.formrecognizer")
+    from app.services import _INSURANCE_RE
+    
+    assert _INSURANCE_RE.search("Member ID: XYZ-987").group(1) == "XYZ-987"
+    assert _INSURANCE_RE.search("insurance: abc123").group(1) == "abc123"
+
+
+def test_date_patterns_find_numeric_and_named_month_dates():
+    from app.utils import TextUtils
+    
+    dates = TextUtils.extract_dates("Seen 03/14/2023, born 1980-07-02, follow-up March 3, 2024")
+    
+    assert "03/14/2023" in dates
+    assert "1980-07-02" in dates
+    assert "March 3, 2024" in dates
+
+
+def test_patterns_match_after_no_break_spaces():
+    pytest.importorskip("spacy")
+    pytest.importorskip("azure.ai.formrecognizer")
+    from app.services import _INSURANCE_RE
+    from app.utils import TextUtils
+    
+    text = TextUtils.normalize_spaces("Insurance:\xa0ABC123")
+    
+    assert _INSURANCE_RE.search(text).group(1) == "ABC123"
+    assert TextUtils.extract_phones("Call\xa0(555)\xa0123-4567") == ["(555) 123-4567"]
+    assert TextUtils.clean_text("Jane\xa0\u2009Doe") == "Jane Doe"
+
+
+def test_named_month_dates_keep_non_ascii_letters():
+    from app.utils import TextUtils
+    
+    assert "März 3, 2024" in TextUtils.extract_dates("Termin: März 3, 2024")
+
+
+def test_date_patterns_keep_numeric_middle_tokens():
+    from app.utils import TextUtils
+    
+    assert "10 20 2020" in TextUtils.extract_dates("Visit 10 20 2020")
+
+
+def test_re2_and_stdlib_patterns_agree():
+    pytest.importorskip("re2")
+    import app.utils as module
+    
+    samples = [
+        "Jane\xa0Doe\u2009jane@example.com 555.123.4567",
+        "Ref \u0663\u0664\u0665 12 März 2024 jöhn@example.com",
+        "a\vb\x1cc\u3000d_e@example.org",
+    ]
+    patterns = [value for name, value in vars(module).items() if name.endswith("_RE")]
+    patterns += module._DATE_SEARCH_PATTERNS + module._DATE_VALID_PATTERNS
+    
+    for pattern in patterns:
+        fallback = stdlib_re.compile(pattern.pattern, stdlib_re.ASCII)
+        for sample in samples:
+            text = module.TextUtils.normalize_spaces(sample)
+            assert pattern.findall(text) == fallback.findall(text), pattern.pattern
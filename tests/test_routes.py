@@ -0,0 +1,280 @@
+"""Tests for the web routes with the services and repositories replaced by mocks."""
+
+import asyncio
+import dataclasses
+import importlib
+import os
+import sys
+import threading
+from datetime import datetime
+from unittest import mock
+
+import orjson
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("azure.ai.formrecognizer")
+
+from fastapi.testclient import TestClient
+
+from app.models import Document, DocumentSummary, ProcessingResult, ProcessingStatus
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def routes(tmp_path_factory):
+    """The routes module, imported from a scratch directory with a blank spaCy pipeline.
+    
+    Static files and templates are resolved relative to the working directory.
+    """
+    workdir = tmp_path_factory.mktemp("web")
+    (workdir / "app" / "web" / "static").mkdir(parents=True)
+    (workdir / "app" / "web" / "static" / "app.css").write_text("body { color: black; }\n" * 100)
+    os.symlink(os.path.join(REPO_ROOT, "app", "web", "templates"), workdir / "app" / "web" / "templates")
+    
+    with pytest.MonkeyPatch.context() as patch:
+        patch.chdir(workdir)
+        patch.setattr("app.services._load_spacy", lambda *args, **kwargs: spacy.blank("en"))
+        module = importlib.import_module("app.web.routes")
+        # The test client does not run startup handlers, so create the directories they would
+        asyncio.run(module.prepare_directories())
+        yield module
+
+
+@pytest.fixture
+def client(routes, monkeypatch):
+    """A test client whose processing service and document repository are mocks."""
+    monkeypatch.setattr(routes, "processing_service", mock.Mock())
+    monkeypatch.setattr(routes, "document_repo", mock.Mock())
+    routes.view_cache.clear()
+    return TestClient(routes.app)
+
+
+def test_batch_stream_reports_an_error_and_closes_the_json(routes, client):
+    def failing_batch(files):
+        yield ProcessingResult(document_id=1, success=True)
+        raise RuntimeError("Azure unavailable")
+    
+    routes.processing_service.list_batch_files.return_value = ["a.pdf", "b.pdf"]
+    routes.processing_service.iter_batch.side_effect = failing_batch
+    
+    response = client.post("/api/process-batch", data={"folder_path": "/data"})
+    
+    assert response.status_code == 200
+    assert response.json() == {
+        "success": True,
+        "results": [
+            {"success": True, "errors": []},
+            {"success": False, "errors": ["Internal server error"]},
+        ],
+        "processed_count": 2,
+        "successful_count": 1,
+    }
+
+
+def test_batch_stream_sends_each_result_as_it_arrives_even_with_gzip(routes, client):
+    routes.processing_service.list_batch_files.return_value = ["a.pdf", "b.pdf"]
+    routes.processing_service.iter_batch.return_value = iter([
+        ProcessingResult(document_id=1, success=True), ProcessingResult(document_id=2, success=True)
+    ])
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/api/process-batch",
+        "raw_path": b"/api/process-batch", "query_string": b"", "root_path": "", "server": ("test", 80),
+        "client": ("test", 1234),
+        "headers": [(b"content-type", b"application/x-www-form-urlencoded"), (b"accept-encoding", b"gzip")],
+    }
+    requests = [{"type": "http.request", "body": b"folder_path=%2Fdata", "more_body": False}]
+    messages = []
+    
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the response is complete
+        await asyncio.Event().wait()
+    
+    async def send(message):
+        messages.append(message)
+    
+    asyncio.run(routes.app(scope, receive, send))
+    
+    assert not any(name == b"content-encoding" for name, _ in messages[0]["headers"])
+    chunks = [message["body"] for message in messages[1:] if message.get("body")]
+    assert chunks[:4] == [
+        b'{"success":true,"results":[', b'{"success":true,"errors":[]}', b",", b'{"success":true,"errors":[]}'
+    ]
+
+
+def test_exports_stream_one_json_line_per_document(routes, client):
+    routes.document_repo.iter_by_status.return_value = iter([
+        Document(id=1, filename="a.pdf", upload_date=datetime(2024, 1, 2), processing_status=ProcessingStatus.FAILED),
+        Document(id=2, filename="b.pdf", upload_date=datetime(2024, 1, 2), processing_status=ProcessingStatus.FAILED),
+    ])
+    routes.document_repo.iter_needing_review.return_value = iter([Document(id=3, filename="c.pdf")])
+    
+    documents = client.get("/api/export/documents", params={"status": "failed"})
+    review = client.get("/api/export/review")
+    
+    routes.document_repo.iter_by_status.assert_called_once_with(ProcessingStatus.FAILED)
+    assert documents.headers["Content-Type"] == "application/x-ndjson"
+    assert [orjson.loads(line)["filename"] for line in documents.text.splitlines()] == ["a.pdf", "b.pdf"]
+    assert orjson.loads(documents.text.splitlines()[0])["status"] == "failed"
+    assert [orjson.loads(line)["id"] for line in review.text.splitlines()] == [3]
+
+
+def test_cached_views_read_the_database_off_the_processing_pool(routes, client):
+    threads = []
+    
+    def record_thread(*args):
+        threads.append(threading.current_thread().name)
+        return []
+    
+    routes.processing_service.get_documents_needing_review.side_effect = record_thread
+    routes.document_repo.get_recent_by_status.side_effect = record_thread
+    
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+    
+    assert len(threads) == 2
+    assert not any(name.startswith("processing") for name in threads)
+
+
+def test_documents_api_sends_etag_and_answers_revalidation_with_304(routes, client):
+    threads = []
+    
+    def status_version(status):
+        threads.append(threading.current_thread().name)
+        return (datetime(2024, 1, 2, 3, 4, 5), 3)
+    
+    routes.document_repo.get_status_version.side_effect = status_version
+    routes.document_repo.get_summaries_by_status.return_value = [
+        DocumentSummary(id=1, filename="scan.pdf", upload_date=datetime(2024, 1, 2))
+    ]
+    
+    first = client.get("/api/documents")
+    revalidated = client.get("/api/documents", headers={"If-None-Match": first.headers["ETag"]})
+    
+    assert first.status_code == 200
+    assert first.json()["documents"][0]["filename"] == "scan.pdf"
+    assert first.headers["Cache-Control"] == routes.API_CACHE_CONTROL
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == first.headers["ETag"]
+    assert not any(name.startswith("processing") for name in threads)
+
+
+def test_documents_api_changes_etag_when_the_version_does(routes, client):
+    routes.document_repo.get_summaries_by_status.return_value = []
+    routes.document_repo.get_status_version.return_value = (datetime(2024, 1, 2), 3)
+    before = client.get("/api/documents").headers["ETag"]
+    routes.document_repo.get_status_version.return_value = (datetime(2024, 1, 2), 4)
+    
+    response = client.get("/api/documents", headers={"If-None-Match": before})
+    
+    assert response.status_code == 200
+    assert response.headers["ETag"] != before
+
+
+def test_shutdown_drains_processing_before_flushing_logs_and_closing_the_pool(routes, monkeypatch):
+    shutdown = mock.Mock()
+    monkeypatch.setattr(routes, "log_buffer", shutdown.log_buffer)
+    monkeypatch.setattr(routes, "db_manager", shutdown.db_manager)
+    monkeypatch.setattr(routes, "processing_executor", shutdown.processing_executor)
+    threads = []
+    
+    def record_thread(*args, **kwargs):
+        threads.append(threading.current_thread())
+    
+    for step in (shutdown.processing_executor.shutdown, shutdown.log_buffer.flush, shutdown.db_manager.disconnect):
+        step.side_effect = record_thread
+    
+    asyncio.run(routes.close_database_pool())
+    
+    assert shutdown.mock_calls == [
+        mock.call.processing_executor.shutdown(wait=True, cancel_futures=True),
+        mock.call.log_buffer.flush(),
+        mock.call.db_manager.disconnect(),
+    ]
+    # Every step blocks, so none of them runs on the event loop thread
+    assert threading.main_thread() not in threads
+
+
+def test_large_json_responses_are_gzipped_and_small_ones_are_not(routes, client):
+    routes.document_repo.get_status_version.return_value = (datetime(2024, 1, 2), 200)
+    routes.document_repo.get_summaries_by_status.return_value = [
+        DocumentSummary(id=i, filename=f"scan_{i}.pdf", upload_date=datetime(2024, 1, 2)) for i in range(200)
+    ]
+    routes.document_repo.get_with_patient.return_value = (None, None)
+    
+    large = client.get("/api/documents", headers={"Accept-Encoding": "gzip"})
+    small = client.get("/api/documents/1", headers={"Accept-Encoding": "gzip"})
+    
+    assert large.headers["Content-Encoding"] == "gzip"
+    assert len(large.json()["documents"]) == 200
+    assert small.status_code == 404
+    assert "Content-Encoding" not in small.headers
+
+
+def test_static_files_are_cacheable_and_revalidate(routes, client):
+    response = client.get("/static/app.css")
+    revalidated = client.get("/static/app.css", headers={"If-None-Match": response.headers["ETag"]})
+    
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == f"public, max-age={routes.config.static_max_age}"
+    assert revalidated.status_code == 304
+
+
+@pytest.fixture
+def upload_dir(routes, client, tmp_path, monkeypatch):
+    """An empty upload directory, with uploads over 3 MiB rejected and processing always succeeding."""
+    monkeypatch.setattr(routes, "config", dataclasses.replace(routes.config, upload_dir=str(tmp_path)))
+    monkeypatch.setattr(routes, "MAX_UPLOAD_BYTES", 3 * 1024 * 1024)
+    routes.processing_service.process_document.return_value = ProcessingResult(document_id=7, success=True)
+    return tmp_path
+
+
+@pytest.fixture
+def sendfile_calls(routes, monkeypatch):
+    """Record the threads uploads are copied with sendfile on, still copying them."""
+    calls = []
+    
+    def recording_sendfile(src_fd, size, file_path):
+        calls.append(threading.current_thread().name)
+        return sendfile_upload(src_fd, size, file_path)
+    
+    sendfile_upload = routes._sendfile_upload
+    monkeypatch.setattr(routes, "_sendfile_upload", recording_sendfile)
+    return calls
+
+
+@pytest.mark.parametrize("size, copied_with_sendfile", [
+    (10 * 1024, False),
+    (2 * 1024 * 1024, sys.platform.startswith("linux")),
+])
+def test_uploads_are_stored_whole_under_a_generated_name(routes, client, upload_dir, sendfile_calls,
+                                                        size, copied_with_sendfile):
+    content = os.urandom(size)
+    
+    response = client.post(
+        "/upload", files={"file": ("scan.pdf", content, "application/pdf")}, follow_redirects=False
+    )
+    
+    assert response.status_code == 303
+    assert response.headers["Location"] == "/document/7"
+    stored = list(upload_dir.iterdir())
+    assert len(stored) == 1 and stored[0].suffix == ".pdf" and stored[0].name != "scan.pdf"
+    assert stored[0].read_bytes() == content
+    assert bool(sendfile_calls) == copied_with_sendfile
+    assert not any(name.startswith("processing") for name in sendfile_calls)
+    routes.processing_service.process_document.assert_called_once_with(str(stored[0]), "scan.pdf")
+
+
+def test_oversize_uploads_are_rejected_and_leave_no_file(routes, client, upload_dir):
+    response = client.post(
+        "/upload", files={"file": ("scan.pdf", b"x" * (4 * 1024 * 1024), "application/pdf")}
+    )
+    
+    assert response.status_code == 413
+    assert list(upload_dir.iterdir()) == []
+    routes.processing_service.process_document.assert_not_called()
@@ -0,0 +1,175 @@
+"""Tests for DocumentProcessingService with Azure, spaCy and the repositories replaced by mocks."""
+
+import dataclasses
+import os
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+pytest.importorskip("azure.ai.formrecognizer")
+
+import app.services
+from app.models import PatientData, ProcessingResult
+from app.services import DocumentProcessingService, NLPService
+
+
+@pytest.fixture
+def service():
+    """A DocumentProcessingService whose collaborators are mocks."""
+    instance = DocumentProcessingService.__new__(DocumentProcessingService)
+    instance.azure_service = mock.Mock()
+    instance.nlp_service = mock.Mock()
+    instance.document_repo = mock.Mock()
+    instance.patient_repo = mock.Mock()
+    instance.log_repo = mock.Mock()
+    return instance
+
+
+@pytest.fixture
+def bulk_load_calls(monkeypatch):
+    """Record bulk_load_mode entries, with every batch large enough to trigger it."""
+    calls = []
+    
+    @contextmanager
+    def fake_bulk_load_mode():
+        calls.append("enter")
+        yield
+    
+    monkeypatch.setattr(app.services, "config", dataclasses.replace(app.services.config, bulk_load_min_files=1))
+    monkeypatch.setattr(app.services.db_manager, "bulk_load_mode", fake_bulk_load_mode)
+    return calls
+
+
+def _files(tmp_path, count):
+    for i in range(count):
+        (tmp_path / f"scan_{i}.pdf").write_bytes(b"%PDF")
+    return sorted(os.scandir(tmp_path), key=lambda entry: entry.name)
+
+
+def _fake_process_files(files):
+    return [ProcessingResult(document_id=i, success=True) for i, _ in enumerate(files)]
+
+
+def test_iter_batch_does_not_enter_bulk_load_mode_by_default(service, bulk_load_calls, tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "_process_files", _fake_process_files)
+    
+    results = list(service.iter_batch(_files(tmp_path, 3)))
+    
+    assert len(results) == 3
+    assert bulk_load_calls == []
+
+
+def test_process_batch_runs_large_imports_in_bulk_load_mode(service, bulk_load_calls, tmp_path, monkeypatch):
+    monkeypatch.setattr(service, "_process_files", _fake_process_files)
+    _files(tmp_path, 3)
+    
+    results = service.process_batch(str(tmp_path))
+    
+    assert len(results) == 3
+    assert bulk_load_calls == ["enter"]
+
+
+def test_process_batch_falls_back_when_bulk_load_mode_times_out(service, tmp_path, monkeypatch):
+    @contextmanager
+    def busy_bulk_load_mode():
+        raise TimeoutError("Advisory lock not acquired")
+        yield
+    
+    monkeypatch.setattr(app.services, "config", dataclasses.replace(app.services.config, bulk_load_min_files=1))
+    monkeypatch.setattr(app.services.db_manager, "bulk_load_mode", busy_bulk_load_mode)
+    monkeypatch.setattr(service, "_process_files", _fake_process_files)
+    _files(tmp_path, 3)
+    
+    results = service.process_batch(str(tmp_path))
+    
+    assert len(results) == 3
+
+
+def test_file_removed_after_listing_fails_only_that_file(service, tmp_path):
+    files = _files(tmp_path, 3)
+    os.remove(files[1].path)
+    service.document_repo.bulk_create.side_effect = lambda documents: [101 + i for i in range(len(documents))]
+    service.azure_service.collect_results.side_effect = lambda pollers: {path: "text" for path in pollers}
+    service.nlp_service.extract_patient_data_batch.side_effect = lambda texts: [PatientData() for _ in texts]
+    
+    results = service._process_files(files)
+    
+    assert [result.success for result in results] == [True, False, True]
+    assert "No such file" in results[1].errors[0]
+
+
+def test_batch_creates_all_document_records_with_one_bulk_insert(service, tmp_path):
+    files = _files(tmp_path, 4)
+    service.document_repo.bulk_create.return_value = [11, 12, 13, 14]
+    service.azure_service.collect_results.side_effect = lambda pollers: {path: "text" for path in pollers}
+    service.nlp_service.extract_patient_data_batch.side_effect = lambda texts: [PatientData() for _ in texts]
+    
+    results = service._process_files(files)
+    
+    service.document_repo.bulk_create.assert_called_once()
+    service.document_repo.create.assert_not_called()
+    assert [result.document_id for result in results] == [11, 12, 13, 14]
+
+
+@pytest.fixture
+def rule_based_nlp(monkeypatch):
+    """An NLPService running the entity_ruler patterns on a blank English pipeline."""
+    monkeypatch.setattr(
+        app.services, "nlp_config",
+        dataclasses.replace(app.services.nlp_config, model_name="blank:en", use_rule_based_ner=True)
+    )
+    return NLPService()
+
+
+@pytest.mark.parametrize("text, name, date_of_birth", [
+    ("Patient: Mrs. Jane Doe\nDOB: 01/02/1990", "Mrs. Jane Doe", "01/02/1990"),
+    ("Dr Smith saw the patient, born 1985-03-02", "Dr Smith", "1985-03-02"),
+    ("Name: Mr. John Q Public, DOB 2 March 1985", "Mr. John Q Public", "2 March 1985"),
+    ("MS. Ann Lee was born on January 2, 1990", "MS. Ann Lee", "January 2, 1990"),
+])
+def test_rule_based_ner_finds_names_and_dates(rule_based_nlp, text, name, date_of_birth):
+    patient_data = rule_based_nlp.extract_patient_data_batch([text])[0]
+    
+    assert patient_data.name.value == name
+    assert patient_data.date_of_birth.raw_text == date_of_birth
+
+
+def test_rule_based_ner_extracts_pattern_fields(rule_based_nlp):
+    text = "Mrs. Jane Doe\nMember ID: ABC-12345\nPhone: (555) 123-4567\nEmail: jane@example.com"
+    
+    patient_data = rule_based_nlp.extract_patient_data(text)
+    
+    assert patient_data.insurance_id.value == "ABC-12345"
+    assert patient_data.email.value == "jane@example.com"
+    assert patient_data.phone.value is not None
+
+
+def _saved_pipeline(path, ner_listens_to_tok2vec):
+    """Save a tok2vec + ner pipeline whose ner either listens to tok2vec or embeds tokens itself."""
+    nlp = spacy.blank("en")
+    nlp.add_pipe("tok2vec")
+    config = {}
+    if ner_listens_to_tok2vec:
+        config = {"model": {
+            "@architectures": "spacy.TransitionBasedParser.v2", "state_type": "ner", "extra_state_tokens": False,
+            "hidden_width": 64, "maxout_pieces": 2, "use_upper": True,
+            "tok2vec": {"@architectures": "spacy.Tok2VecListener.v1", "width": 96, "upstream": "*"},
+        }}
+    nlp.add_pipe("ner", config=config).add_label("PERSON")
+    nlp.initialize()
+    nlp.to_disk(path)
+    return str(path)
+
+
+@pytest.mark.parametrize("ner_listens_to_tok2vec, pipe_names", [
+    (False, ["ner"]),
+    (True, ["tok2vec", "ner"]),
+])
+def test_load_spacy_keeps_tok2vec_only_when_ner_listens_to_it(tmp_path, ner_listens_to_tok2vec, pipe_names):
+    model_path = _saved_pipeline(tmp_path, ner_listens_to_tok2vec)
+    
+    nlp = app.services._load_spacy(model_path, app.services._ENTITY_PIPES)
+    
+    assert nlp.pipe_names == pipe_names